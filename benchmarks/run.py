@@ -0,0 +1,243 @@
+"""Render benchmarks: every dashboard against recorded API responses and a simulated panel.
+
+    python -m benchmarks.run                    # compare with benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline    # record a new baseline on this machine
+    python -m benchmarks.run clock weather -n 50
+
+Stages per dashboard: `import` (first load of the dashboard module), `fetch`
+(provider refresh served from benchmarks/fixtures), `render` (draw and pack
+the frame) and `refresh` (driver writing the frame to the simulated panel,
+with the panel's busy time scaled to zero). `render` also reports the peak
+memory traced while drawing one frame and the blocks it leaves allocated.
+
+A stage regresses when its fastest run is more than TOLERANCE (25%) and
+MIN_REGRESSION_MS (3 ms) slower than in the baseline, or its peak memory
+is more than 25% higher. The cold import is reported but never gated on.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from urllib.parse import urlsplit, parse_qs
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'fixtures')
+BASELINE_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+CONFIG_PATH = os.path.join(REPO_ROOT, 'config.yaml')
+
+DASHBOARDS = ('clock', 'weather', 'stocks', 'youtube', 'text', 'image')
+DEFAULT_REPEAT = 20
+
+# A stage regresses once its fastest run is this much slower than the baseline's (and by at
+# least MIN_REGRESSION_MS); the same ratio applies to peak memory. The minimum is compared
+# because it is far less noisy than the median on a busy machine.
+TOLERANCE = 0.25
+MIN_REGRESSION_MS = 3.0
+
+# Synthetic YouTube history for the chart: one sample every 10 minutes
+HISTORY_DAYS = 120
+HISTORY_STEP_SECONDS = 600
+
+class FixtureResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+class FixtureSession:
+    """Answers the dashboards' API calls from benchmarks/fixtures instead of the network."""
+
+    def __init__(self, fixture_dir=FIXTURE_DIR):
+        def read(name):
+            with open(os.path.join(fixture_dir, name), encoding='utf-8') as f:
+                return f.read()
+        self.forecast = read('open-meteo-forecast.json')
+        self.quotes = {sym: json.dumps(quote) for sym, quote in json.loads(read('finnhub-quote.json')).items()}
+        self.channels = read('youtube-channels.json')
+
+    def get(self, url, headers=None, timeout=None):
+        parts = urlsplit(url)
+        endpoint = parts.netloc + parts.path
+        if endpoint == 'api.open-meteo.com/v1/forecast':
+            return FixtureResponse(200, self.forecast)
+        if endpoint == 'finnhub.io/api/v1/quote':
+            quote = self.quotes.get(parse_qs(parts.query).get('symbol', [''])[0])
+            return FixtureResponse(200, quote) if quote else FixtureResponse(404, 'null')
+        if endpoint == 'www.googleapis.com/youtube/v3/channels':
+            return FixtureResponse(200, self.channels)
+        return FixtureResponse(404, 'null')
+
+def summarize(seconds):
+    ms = [s * 1000 for s in seconds]
+    return {'cold_ms': ms[0], 'median_ms': statistics.median(ms[1:] or ms), 'min_ms': min(ms)}
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def prepare(workdir, frames_dir=None):
+    """Point the app at fixtures, a simulated panel and a scratch data directory; returns the config."""
+    os.chdir(REPO_ROOT)  # config paths (fonts, assets) are relative to the repo
+    sys.path.insert(0, REPO_ROOT)
+    os.environ['EPD_BACKEND'] = 'simulated'
+    os.environ['EPD_SIM_TIME_SCALE'] = '0'
+    os.environ['EPD_SIM_OUTPUT'] = frames_dir or ''
+    for key in ('FINNHUB_API_KEY', 'YOUTUBE_API_KEY', 'YOUTUBE_CHANNEL_ID'):
+        os.environ.setdefault(key, 'benchmark')
+
+    import yaml
+    import providers
+    from config_service import freeze
+    from lib import httpclient
+
+    providers.LAST_GOOD_DIR = os.path.join(workdir, 'last_good')
+    httpclient.set_session(FixtureSession())
+
+    from providers import youtube
+    youtube.history.path = os.path.join(workdir, 'subscribers.ts')
+    now = int(time.time())
+    count = HISTORY_DAYS * 86400 // HISTORY_STEP_SECONDS
+    youtube.history.extend((now - (count - i) * HISTORY_STEP_SECONDS, 4000 + i // 12) for i in range(count))
+
+    with open(CONFIG_PATH) as f:
+        config = yaml.safe_load(f)
+    # Fixed coordinates, so nothing is geocoded
+    config.setdefault('weather', {}).update(latitude=40.3853, longitude=-111.8651)
+    return freeze(config)
+
+def bench_dashboard(name, epd, config, repeat):
+    import display
+    import providers
+    from lib import httpclient
+
+    stages = {}
+    seconds, _ = timed(display.get_renderer, name)
+    stages['import'] = {'cold_ms': seconds * 1000, 'median_ms': seconds * 1000, 'min_ms': seconds * 1000}
+
+    if name in providers.PROVIDER_CLASSES:
+        provider = providers.get(name)
+        provider.configure(config)
+        samples = []
+        for _ in range(repeat):
+            httpclient.clear_cache()
+            samples.append(timed(provider.refresh)[0])
+        stages['fetch'] = summarize(samples)
+        # The snapshot is in place; keep latest() from starting the background fetch thread
+        provider.active = True
+
+    flip_screen = config.get('flip_screen', False)
+    samples = []
+    frame = None
+    for _ in range(repeat):
+        seconds, frame = timed(display.render_frame, name, epd, config, flip_screen=flip_screen)
+        samples.append(seconds)
+    if frame is None:
+        raise RuntimeError(f"{name} dashboard produced no frame")
+    stages['render'] = summarize(samples)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    start_size = tracemalloc.get_traced_memory()[0]
+    display.render_frame(name, epd, config, flip_screen=flip_screen)
+    peak = tracemalloc.get_traced_memory()[1]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stages['render']['peak_kib'] = (peak - start_size) / 1024
+    stages['render']['retained_blocks'] = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+
+    # Alternate with the inverted frame so every push is a real RAM write and refresh
+    inverse = bytes(b ^ 0xFF for b in frame.buffer)
+    samples = []
+    for _ in range(repeat):
+        epd.display_fast(inverse)
+        samples.append(timed(epd.display_fast, frame.buffer)[0])
+    stages['refresh'] = summarize(samples)
+    return stages
+
+def compare(results, baseline):
+    """Human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for name, stages in results.items():
+        for stage, now in stages.items():
+            then = baseline.get('results', {}).get(name, {}).get(stage)
+            if not then or stage == 'import':
+                continue  # a single cold import is too noisy to gate on
+            slower = now['min_ms'] - then['min_ms']
+            if slower > MIN_REGRESSION_MS and now['min_ms'] > then['min_ms'] * (1 + TOLERANCE):
+                regressions.append(f"{name} {stage}: {now['min_ms']:.1f} ms, baseline {then['min_ms']:.1f} ms")
+            if 'peak_kib' in then and now['peak_kib'] > then['peak_kib'] * (1 + TOLERANCE):
+                regressions.append(f"{name} {stage}: peak {now['peak_kib']:.0f} KiB, baseline {then['peak_kib']:.0f} KiB")
+    return regressions
+
+def print_table(results):
+    print(f"{'dashboard':<10} {'stage':<8} {'cold ms':>9} {'median ms':>10} {'min ms':>8} {'peak KiB':>9} {'blocks':>7}")
+    for name, stages in results.items():
+        for stage, r in stages.items():
+            peak = f"{r['peak_kib']:.0f}" if 'peak_kib' in r else ''
+            blocks = str(r['retained_blocks']) if 'retained_blocks' in r else ''
+            print(f"{name:<10} {stage:<8} {r['cold_ms']:>9.2f} {r['median_ms']:>10.2f} {r['min_ms']:>8.2f} {peak:>9} {blocks:>7}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dashboard rendering without hardware or network.")
+    parser.add_argument('dashboards', nargs='*', default=DASHBOARDS, help="dashboards to run (default: all)")
+    parser.add_argument('-n', '--repeat', type=int, default=DEFAULT_REPEAT, help="runs per stage")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline file to compare with or save to")
+    parser.add_argument('--save-baseline', action='store_true', help="record these results as the baseline")
+    parser.add_argument('--frames', metavar='DIR', help="save every simulated refresh as a PNG in DIR")
+    parser.add_argument('-v', '--verbose', action='store_true', help="show the app's log output")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING,
+                        format='%(asctime)s [%(levelname)s] %(message)s')
+
+    with tempfile.TemporaryDirectory(prefix='eink-bench-') as workdir:
+        config = prepare(workdir, args.frames)
+        import lib.epd2in13b_V4 as epd2in13b_V4
+        epd = epd2in13b_V4.EPD()
+        epd.init_fast()
+
+        results = {name: bench_dashboard(name, epd, config, args.repeat) for name in args.dashboards}
+
+    print_table(results)
+    panel = epd2in13b_V4.epdconfig
+    print("\nSimulated panel busy time: " +
+          ", ".join(f"{mode} {count}x {panel.busy_total[mode]:.1f}s" for mode, count in sorted(panel.refreshes.items())))
+
+    machine = {'machine': platform.machine(), 'python': platform.python_version()}
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({**machine, 'repeat': args.repeat, 'results': results}, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; record one with --save-baseline")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != machine['machine']:
+        print(f"\nNote: baseline was recorded on {baseline.get('machine')}, this is {machine['machine']}")
+    regressions = compare(results, baseline)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        return 1
+    print("\nNo regressions against the baseline")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+import time
+import yaml
+import ctypes
+import ctypes.util
+import struct
+import logging
+import threading
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+def freeze(obj):
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+def thaw(obj):
+    """Inverse of freeze(): a plain, mutable copy suitable for yaml.dump."""
+    if isinstance(obj, (dict, MappingProxyType)):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [thaw(v) for v in obj]
+    return obj
+
+class ConfigService:
+    """Parses config.yaml once and re-parses it only when the file changes.
+
+    get() returns an immutable snapshot that is safe to share between threads.
+    Changes are picked up by an inotify watch on the config directory, or by
+    polling the mtime where inotify is unavailable, and passed to subscribers.
+    """
+
+    def __init__(self, path, poll_interval=2.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._mtime = None
+        self._snapshot = None
+        self._thread = None
+        if not self.reload():
+            raise RuntimeError(f"Could not load config from {path}")
+
+    def get(self):
+        return self._snapshot
+
+    def subscribe(self, callback):
+        """Call `callback(snapshot)` after every successful reload."""
+        self._subscribers.append(callback)
+
+    def reload(self):
+        """Re-parse the file. Keeps the previous snapshot if it is missing or invalid."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path, 'r') as f:
+                    data = yaml.safe_load(f)
+                if not isinstance(data, dict):
+                    raise ValueError("config is empty or not a mapping")
+            except Exception as e:
+                logger.warning(f"Failed to load {self.path}, keeping previous config: {e}")
+                return False
+            self._mtime = mtime
+            self._snapshot = freeze(data)
+            snapshot = self._snapshot
+        logger.debug(f"Loaded config from {self.path}")
+        for callback in list(self._subscribers):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.exception(f"Config subscriber failed: {e}")
+        return True
+
+    def check(self):
+        """Reload if the file's mtime moved since the last parse."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime != self._mtime:
+            return self.reload()
+        return False
+
+    def save(self, config):
+        """Write `config` (a snapshot or plain dict) to disk and reload it."""
+        with open(self.path, 'w') as f:
+            yaml.dump(thaw(config), f)
+        self.reload()
+
+    def start(self):
+        """Watch the file in a daemon thread."""
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._watch, name='config-watch', daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        try:
+            self._watch_inotify()
+        except Exception as e:
+            logger.info(f"inotify unavailable ({e}), polling {self.path} every {self.poll_interval}s")
+        while True:
+            time.sleep(self.poll_interval)
+            self.check()
+
+    def _watch_inotify(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Watch the directory: editors and some writers replace the file instead of rewriting it
+        directory = os.path.dirname(os.path.abspath(self.path))
+        name = os.path.basename(self.path)
+        wd = libc.inotify_add_watch(fd, directory.encode(), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            os.close(fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        logger.debug(f"Watching {self.path} with inotify")
+
+        while True:
+            data = os.read(fd, 4096)
+            changed = False
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                event_name = data[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+                offset += length
+                if event_name == name:
+                    changed = True
+            if changed:
+                self.check()
@@ -1,8 +1,12 @@
 from zoneinfo import ZoneInfo
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image
 import os
 import logging
+from lib import refresh, framebuffer
+from lib.fonts import get_font
+from lib.assets import load_1bit
+from lib.compose import draw_text
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +26,8 @@ def render(epd, config, flip_screen=False):
         date_format = clock_cfg.get('date_format', '%Y-%m-%d')
         spacing = clock_cfg.get('vertical_spacing', 5)
         invert = clock_cfg.get('invert_colors', False)
+        partial_refresh = clock_cfg.get('partial_refresh', True)
+        full_refresh_every = clock_cfg.get('full_refresh_every', refresh.DEFAULT_FULL_REFRESH_EVERY)
 
         tz_name = clock_cfg.get('timezone')
         if tz_name:
@@ -40,31 +46,23 @@ def render(epd, config, flip_screen=False):
 
         logger.debug(f"Time: {time_str}, Date: {date_str if show_date else 'N/A'}")
 
-        time_font = ImageFont.truetype(font_path, time_font_size)
-        date_font = ImageFont.truetype(font_path, date_font_size) if show_date else None
+        time_font = get_font(font_path, time_font_size)
+        date_font = get_font(font_path, date_font_size) if show_date else None
 
         background_color = 0 if invert else 255
         text_color = 255 if invert else 0
 
         black_img = Image.new('1', (height, width), background_color)
-        red_img = Image.new('1', (height, width), 255)
 
         # Paste background image if present
         if bg_path and os.path.exists(bg_path):
             try:
-                background = Image.open(bg_path).convert('L').resize((height, width))
-                if invert:
-                    background = ImageOps.invert(background)
-                background = background.convert('1')
+                background = load_1bit(bg_path, (height, width), invert=invert)
                 black_img.paste(background)
                 logger.debug(f"Pasted background from {bg_path}")
             except Exception as e:
                 logger.warning(f"Failed to load background {bg_path}: {e}")
 
-        # Draw text onto grayscale layer for masking
-        text_layer = Image.new('L', (height, width), 255)  # white background
-        draw_text = ImageDraw.Draw(text_layer)
-
         time_w, time_h = time_font.getmask(time_str).size
 
         if show_date:
@@ -78,25 +76,16 @@ def render(epd, config, flip_screen=False):
             date_x = (height - date_w) // 2
             date_y = top_margin + time_h + spacing
 
-            draw_text.text((time_x, time_y), time_str, font=time_font, fill=0)
-            draw_text.text((date_x, date_y), date_str, font=date_font, fill=0)
+            draw_text(black_img, (time_x, time_y), time_str, time_font, text_color)
+            draw_text(black_img, (date_x, date_y), date_str, date_font, text_color)
         else:
             time_x = (height - time_w) // 2
             time_y = (width - time_h) // 2
-            draw_text.text((time_x, time_y), time_str, font=time_font, fill=0)
-
-        # Convert grayscale to binary mask: black text becomes white mask
-        mask = text_layer.point(lambda p: 255 if p < 128 else 0, mode='1')
-
-        # Always paste black text for visibility, regardless of inversion
-        text_color = 255 if invert else 0
-        black_img.paste(Image.new('1', (height, width), text_color), (0, 0), mask)
+            draw_text(black_img, (time_x, time_y), time_str, time_font, text_color)
 
-        logger.debug("Sending image to display")
-        if flip_screen:
-            black_img = black_img.rotate(180)  # flip upside-down
-        epd.display_fast(epd.getbuffer(black_img))
         logger.debug("Clock dashboard rendered")
+        return framebuffer.Frame(framebuffer.pack(black_img, epd.width, epd.height, flip=flip_screen),
+                                 partial=partial_refresh, full_refresh_every=full_refresh_every)
 
     except Exception as e:
         logger.exception(f"Clock rendering failed: {e}")
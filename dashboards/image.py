@@ -1,6 +1,8 @@
-from PIL import Image, ImageOps
+from PIL import Image
 import os
 import logging
+from lib.assets import load_1bit
+from lib import framebuffer
 
 logger = logging.getLogger(__name__)
 
@@ -19,9 +21,9 @@ def render(epd, config, flip_screen=False):
         invert = cfg.get('invert_colors', False)
         scale_mode = cfg.get('scale_mode', 'fit')  # 'fit', 'fill', or 'none'
 
-        # Load image
-        img = Image.open(img_path).convert('L')
-        img_w, img_h = img.size
+        # Read just the header for the size; the pixels come from the asset cache
+        with Image.open(img_path) as src:
+            img_w, img_h = src.size
 
         if scale_mode in ('fit', 'fill'):
             scale_w = height / img_w
@@ -31,19 +33,16 @@ def render(epd, config, flip_screen=False):
             else:
                 scale = max(scale_w, scale_h)  # zoom to fill, may crop
             if scale != 1.0:
-                img = img.resize((int(img_w * scale), int(img_h * scale)), Image.LANCZOS)
-                img_w, img_h = img.size
+                img_w, img_h = int(img_w * scale), int(img_h * scale)
         elif scale_mode == 'none':
             # Only scale down if image is larger than display
             if img_w > height or img_h > width:
                 scale_w = height / img_w
                 scale_h = width / img_h
                 scale = min(scale_w, scale_h, 1.0)
-                img = img.resize((int(img_w * scale), int(img_h * scale)), Image.LANCZOS)
-                img_w, img_h = img.size
+                img_w, img_h = int(img_w * scale), int(img_h * scale)
 
-        if invert:
-            img = ImageOps.invert(img)
+        img = load_1bit(img_path, (img_w, img_h), invert=invert, resample=Image.LANCZOS)
 
         # Create canvas
         canvas = Image.new('1', (height, width), 255)
@@ -51,13 +50,10 @@ def render(epd, config, flip_screen=False):
         # Center the image
         x = (height - img_w) // 2
         y = (width - img_h) // 2
-        canvas.paste(img.convert('1'), (x, y))
+        canvas.paste(img, (x, y))
 
-        if flip_screen:
-            canvas = canvas.rotate(180)
-
-        epd.display_fast(epd.getbuffer(canvas))
-        logger.info(f"Image displayed: {img_path} (scale_mode={scale_mode})")
+        logger.info(f"Image rendered: {img_path} (scale_mode={scale_mode})")
+        return framebuffer.Frame(framebuffer.pack(canvas, epd.width, epd.height, flip=flip_screen))
 
     except Exception as e:
         logger.exception(f"Image dashboard failed: {e}")
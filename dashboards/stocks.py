@@ -1,8 +1,11 @@
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image, ImageDraw
 import os
 import logging
-import requests
-from dotenv import load_dotenv
+from lib.fonts import get_font
+from lib.assets import load_1bit
+from lib.compose import draw_badge
+from lib import framebuffer
+import providers
 
 logger = logging.getLogger(__name__)
 
@@ -16,43 +19,24 @@ def render(epd, config, flip_screen=False):
         font_path = stock_cfg.get('font_path', '/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf')
         font_size = stock_cfg.get('font_size', 18)
         invert = stock_cfg.get('invert_colors', False)
-        symbols = stock_cfg.get('symbols', [])[:8]
 
         white = 255 if not invert else 0
         text_color = 255 if invert else 0
 
-        font = ImageFont.truetype(font_path, font_size)
+        font = get_font(font_path, font_size)
         black_img = Image.new('1', (height, width), white)
-        red_img = Image.new('1', (height, width), 255)
 
         if bg_path and os.path.exists(bg_path):
             try:
-                bg = Image.open(bg_path).convert('L').resize((height, width))
-                if invert:
-                    bg = ImageOps.invert(bg)
-                black_img.paste(bg.convert('1'))
+                black_img.paste(load_1bit(bg_path, (height, width), invert=invert))
                 logger.debug(f"Applied background image: {bg_path}")
             except Exception as e:
                 logger.warning(f"Failed to load background: {bg_path}, error: {e}")
 
         draw = ImageDraw.Draw(black_img)
 
-        load_dotenv()
-        api_key = os.getenv("FINNHUB_API_KEY")
-        results = []
-        for sym in symbols:
-            try:
-                url = f"https://finnhub.io/api/v1/quote?symbol={sym}&token={api_key}"
-                resp = requests.get(url)
-                resp.raise_for_status()
-                data = resp.json()
-                price = data.get('c')
-                prev = data.get('pc')
-                if price and prev:
-                    change_pct = ((price - prev) / prev) * 100
-                    results.append((sym, price, change_pct))
-            except Exception as e:
-                logger.warning(f"Failed to fetch {sym}: {e}")
+        snapshot = providers.latest('stocks', config)
+        results = snapshot.data
 
         top_margin = 6
         row_height = font_size + 4
@@ -86,14 +70,14 @@ def render(epd, config, flip_screen=False):
             draw.text((col_x["pct_right"] - total_w, y), arrow, font=font, fill=text_color)
             draw.text((col_x["pct_right"] - pct_w, y), pct_str, font=font, fill=text_color)
 
-        rotated_black = black_img.rotate(90, expand=True)
-        rotated_red = red_img.rotate(90, expand=True)
-        if invert:
-            rotated_black = Image.eval(rotated_black, lambda px: 255 - px)
-        if flip_screen:
-            rotated_black = rotated_black.rotate(180)  # flip upside-down
-        epd.display_fast(epd.getbuffer(rotated_black))
+        # Flag data the provider hasn't been able to refresh
+        stale = providers.age_label('stocks', snapshot, config)
+        if stale:
+            draw_badge(black_img, stale, get_font(font_path, int(font_size * 0.6)))
+
         logger.debug("Stocks dashboard rendered")
+        # Rotated to the panel, inverted and flipped while packing
+        return framebuffer.Frame(framebuffer.pack(black_img, epd.width, epd.height, flip=flip_screen, invert=invert))
 
     except Exception as e:
         logger.exception(f"Stocks rendering failed: {e}")
@@ -1,6 +1,10 @@
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image
 import os
 import logging
+from lib.fonts import get_font
+from lib.assets import load_1bit
+from lib.compose import draw_text
+from lib import framebuffer
 
 logger = logging.getLogger(__name__)
 
@@ -34,17 +38,14 @@ def render(epd, config, flip_screen=False):
         # Optional background image
         if bg_path and os.path.exists(bg_path):
             try:
-                background = Image.open(bg_path).convert('L').resize((height, width))
-                if invert:
-                    background = ImageOps.invert(background)
-                background = background.convert('1')
+                background = load_1bit(bg_path, (height, width), invert=invert)
                 black_img.paste(background)
                 logger.debug(f"Pasted background: {bg_path}")
             except Exception as e:
                 logger.warning(f"Failed to load background {bg_path}: {e}")
 
         # Load font
-        font = ImageFont.truetype(font_path, font_size)
+        font = get_font(font_path, font_size)
 
         # Render multi-line text
         lines = message.splitlines() or [""]  # fallback to one empty line
@@ -64,9 +65,6 @@ def render(epd, config, flip_screen=False):
         else:  # center
             top_y = (width - total_height) // 2
 
-        text_layer = Image.new('L', (height, width), 255)
-        draw = ImageDraw.Draw(text_layer)
-
         current_y = top_y
         for (line, (line_w, line_h)) in zip(lines, line_sizes):
             if align == 'left':
@@ -76,23 +74,11 @@ def render(epd, config, flip_screen=False):
             else:  # center
                 x = (height - line_w) // 2
 
-            draw.text((x, current_y), line, font=font, fill=0)
+            draw_text(black_img, (x, current_y), line, font, text_color)
             current_y += line_h + spacing
 
-        # Convert grayscale to mask
-        mask = text_layer.point(lambda p: 255 if p < 128 else 0, mode='1')
-
-        # Apply mask to base image
-        black_img.paste(Image.new('1', (height, width), text_color), (0, 0), mask)
-
-        if invert:
-            blac_img = Image.eval(black_img, lambda px: 255 - px)
-
-        logger.debug("Sending text dashboard to display")
-        if flip_screen:
-            black_img = black_img.rotate(180)  # flip upside-down
-        epd.display_fast(epd.getbuffer(black_img))
         logger.debug("Text dashboard rendered")
+        return framebuffer.Frame(framebuffer.pack(black_img, epd.width, epd.height, flip=flip_screen))
 
     except Exception as e:
         logger.exception(f"Text dashboard failed: {e}")
\ No newline at end of file
@@ -1,10 +1,13 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import os
 import logging
-import requests
 from datetime import datetime, time
 from dateutil import parser
-from geopy.geocoders import Nominatim
+from lib.fonts import get_font
+from lib.assets import load_1bit
+from lib.compose import draw_badge
+from lib import framebuffer
+import providers
 
 logger = logging.getLogger(__name__)
 
@@ -72,17 +75,6 @@ def icon_path_for_code(code, night=False):
     adjusted = adjust_icon_for_daylight(filename, night)
     return os.path.join(ICON_DIR, adjusted)
 
-def zip_to_latlon(zip_code):
-    try:
-        geolocator = Nominatim(user_agent="eink-weather")
-        location = geolocator.geocode({"postalcode": zip_code, "country": "USA"})
-        if not location:
-            raise ValueError(f"No lat/lon found for ZIP {zip_code}")
-        return location.latitude, location.longitude
-    except Exception as e:
-        logger.exception(f"ZIP to lat/lon failed for {zip_code}")
-        raise
-
 def degrees_to_compass(deg):
     dirs = [
         "N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
@@ -91,19 +83,6 @@ def degrees_to_compass(deg):
     ix = round(deg / 22.5) % 16
     return dirs[ix]
 
-def fetch_weather(lat, lon, forecast_mode, use_celsius):
-    units = "celsius" if use_celsius else "fahrenheit"
-    base_url = (
-        f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
-        f"&current_weather=true&timezone=auto"
-        f"&daily=sunrise,sunset,temperature_2m_max,temperature_2m_min,weathercode"
-        f"&hourly=temperature_2m,apparent_temperature,weathercode,relative_humidity_2m"
-        f"&temperature_unit={units}"
-    )
-    r = requests.get(base_url)
-    r.raise_for_status()
-    return r.json()
-
 def render(epd, config, flip_screen=False):
     try:
         logger.debug("Rendering weather dashboard")
@@ -114,7 +93,6 @@ def render(epd, config, flip_screen=False):
         font_path = cfg.get('font_path', '/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf')
         font_size = cfg.get('font_size', 24)
         invert = cfg.get('invert_colors', False)
-        zip_code = cfg.get('location', '84101')
         use_celsius = cfg.get('units', 'C') == 'C'
         forecast_mode = cfg.get('forecast_mode', 'hourly')
         date_fmt = cfg.get('date_format', '%a %b %d')
@@ -122,11 +100,11 @@ def render(epd, config, flip_screen=False):
         white = 255 if not invert else 0
         text_color = 0
 
-        font = ImageFont.truetype(font_path, font_size)
-        small_font = ImageFont.truetype(font_path, int(font_size * 0.6))
+        font = get_font(font_path, font_size)
+        small_font = get_font(font_path, int(font_size * 0.6))
 
-        lat, lon = zip_to_latlon(zip_code)
-        weather = fetch_weather(lat, lon, forecast_mode, use_celsius)
+        snapshot = providers.latest('weather', config)
+        weather = snapshot.data
 
         current = weather["current_weather"]
         hourly = weather.get("hourly", {})
@@ -151,7 +129,7 @@ def render(epd, config, flip_screen=False):
 
         if bg_path and os.path.exists(bg_path):
             try:
-                background = Image.open(bg_path).convert('1').resize((width, height))
+                background = load_1bit(bg_path, (width, height), smooth=False)
                 black_img.paste(background)
                 logger.debug(f"Applied background image: {bg_path}")
             except Exception as e:
@@ -168,7 +146,7 @@ def render(epd, config, flip_screen=False):
         # Current icon
         current_code = current.get("weathercode", 0)
         icon_path = icon_path_for_code(current_code, night)
-        icon = Image.open(icon_path).convert('1')
+        icon = load_1bit(icon_path, smooth=False)
         black_img.paste(icon, (4, 4))
 
         # Temp and humidity
@@ -253,7 +231,7 @@ def render(epd, config, flip_screen=False):
 
             # Load and paste icon
             icon_path = icon_path_for_code(f_code, False)
-            icon = Image.open(icon_path).convert('1').resize((icon_size, icon_size))
+            icon = load_1bit(icon_path, (icon_size, icon_size), smooth=False)
             black_img.paste(icon, (x, icon_y))
 
             # Draw text
@@ -261,15 +239,14 @@ def render(epd, config, flip_screen=False):
             draw.text((x, temp_y), temp_str, font=small_font, fill=text_color)
 
 
-        # Rotate and invert if needed
-        rotated_black = black_img.rotate(90, expand=True)
+        # Flag data the provider hasn't been able to refresh
+        stale = providers.age_label('weather', snapshot, config)
+        if stale:
+            draw_badge(black_img, stale, small_font)
 
-        if invert:
-            rotated_black = Image.eval(rotated_black, lambda px: 255 - px)
-        if flip_screen:
-            rotated_black = rotated_black.rotate(180)  # flip upside-down
-        epd.display_fast(epd.getbuffer(rotated_black))
         logger.debug("Weather dashboard rendered")
+        # Rotated to the panel, inverted and flipped while packing
+        return framebuffer.Frame(framebuffer.pack(black_img, epd.width, epd.height, flip=flip_screen, invert=invert))
 
     except Exception as e:
         logger.exception(f"Weather rendering failed: {e}")
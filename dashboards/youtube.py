@@ -1,11 +1,13 @@
-from datetime import datetime, timedelta
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image, ImageDraw
 import os
 import logging
-import requests
-import csv
-import pandas as pd
-from dotenv import load_dotenv
+from lib.fonts import get_font
+from lib.assets import load_1bit
+from lib.compose import draw_badge, draw_text
+from lib import framebuffer
+from lib.chart import draw_series
+import providers
+from providers.youtube import history
 
 logger = logging.getLogger(__name__)
 
@@ -26,58 +28,26 @@ def render(epd, config, flip_screen=False):
         text_color = 255 if invert else 0
 
         black_img = Image.new('1', (height, width), white)
-        red_img = Image.new('1', (height, width), 255)
 
         if bg_path and os.path.exists(bg_path):
             try:
-                bg = Image.open(bg_path).convert('L').resize((height, width))
-                if invert:
-                    bg = ImageOps.invert(bg)
-                black_img.paste(bg.convert('1'))
+                black_img.paste(load_1bit(bg_path, (height, width), invert=invert))
                 logger.debug(f"Applied background image: {bg_path}")
             except Exception as e:
                 logger.warning(f"Failed to load background: {bg_path}, error: {e}")
 
-        load_dotenv()
-        api_key = os.getenv("YOUTUBE_API_KEY")
-        channel_id = os.getenv("YOUTUBE_CHANNEL_ID")
-        if not api_key or not channel_id:
-            raise RuntimeError("Missing YOUTUBE_API_KEY or YOUTUBE_CHANNEL_ID in .env")
-
-        # Fetch current stats
-        url = (
-            "https://www.googleapis.com/youtube/v3/channels"
-            f"?part=snippet,statistics&id={channel_id}&key={api_key}"
-        )
-        resp = requests.get(url)
-        resp.raise_for_status()
-        data = resp.json()
-        item = data['items'][0]
-        sub_count = int(item['statistics']['subscriberCount'])
-        logger.debug(f"Subscribers: {sub_count}")
-
-        # Save to CSV
-        os.makedirs("data", exist_ok=True)
-        csv_path = "data/subscribers.csv"
-        write_header = not os.path.exists(csv_path)
-        with open(csv_path, "a", newline="") as f:
-            writer = csv.writer(f)
-            if write_header:
-                writer.writerow(["timestamp", "subscribers"])
-            writer.writerow([datetime.now().isoformat(), sub_count])
+        snapshot = providers.latest('youtube', config)
+        sub_count = snapshot.data['subscribers']
+        samples = []
 
         # Draw history chart if enabled
-        if show_history and os.path.exists(csv_path):
+        last_sample = history.last() if show_history else None
+        if last_sample:
             try:
-                df = pd.read_csv(csv_path, parse_dates=["timestamp"])
-                latest = df["timestamp"].max()
-                earliest = latest - timedelta(days=history_days)
-                df = df[df["timestamp"] >= earliest].sort_values("timestamp")
+                latest = last_sample[0]
+                timestamps, samples = history.range(latest - history_days * 86400, latest)
 
-                values = df["subscribers"].tolist()
-                times = df["timestamp"].tolist()
-
-                gain = sub_count - values[0] if values else 0
+                gain = sub_count - int(samples[0]) if len(samples) else 0
 
                 # Determine appropriate unit
                 if history_days < 2:
@@ -91,43 +61,15 @@ def render(epd, config, flip_screen=False):
 
                 gain_str = f"+{gain:,} {unit}"
 
-                if len(values) >= 2:
-                    chart_w, chart_h = 225, 60
-                    chart_x, chart_y = 6, width - chart_h - 6
-                    min_val, max_val = min(values), max(values)
-                    val_range = max_val - min_val or 1
-                    time_start = times[0].timestamp()
-                    time_end = times[-1].timestamp()
-                    time_range = time_end - time_start or 1
-
-                    draw = ImageDraw.Draw(black_img)
-                    points = []
-                    for t, v in zip(times, values):
-                        px = chart_x + int(((t.timestamp() - time_start) / time_range) * (chart_w - 1))
-                        py = chart_y + chart_h - 2 - int(((v - min_val) / val_range) * (chart_h - 3))
-                        points.append((px, py))
-
-                    drawn_dates = set()
-                    last_t = times[-1].date()
-
-                    for (x, y), t in zip(points, times):
-                        t_date = t.date()
-                        is_last = t_date == last_t and t == times[-1]
-                        if t_date not in drawn_dates or is_last:
-                            draw.line([(x, chart_y + chart_h - 1), (x, y + 1)], fill=0)
-                            drawn_dates.add(t_date)
-
-                    for i in range(1, len(points)):
-                        draw.line([points[i - 1], points[i]], fill=0)
+                chart_w, chart_h = 225, 60
+                chart_x, chart_y = 6, width - chart_h - 6
+                draw_series(ImageDraw.Draw(black_img), (chart_x, chart_y, chart_w, chart_h), timestamps, samples)
             except Exception as e:
                 logger.warning(f"Failed to draw history plot: {e}")
 
         # Prepare subscriber text
         sub_str = f"{sub_count:,} Subscribers"
-        subs_font = ImageFont.truetype(font_path, font_size)
-
-        text_layer = Image.new('L', (height, width), 255)
-        draw_text = ImageDraw.Draw(text_layer)
+        subs_font = get_font(font_path, font_size)
 
         bbox = subs_font.getbbox(sub_str)
         text_w = bbox[2] - bbox[0]
@@ -136,25 +78,23 @@ def render(epd, config, flip_screen=False):
         x = (height - text_w) // 2
         y = 4
 
-        draw_text.text((x, y), sub_str, font=subs_font, fill=0)
-        if cfg.get("show_gain", False) and values:
-            gain_font = ImageFont.truetype(font_path, int(font_size * 0.75))
+        draw_text(black_img, (x, y), sub_str, subs_font, text_color)
+        if cfg.get("show_gain", False) and len(samples):
+            gain_font = get_font(font_path, int(font_size * 0.75))
             gain_bbox = gain_font.getbbox(gain_str)
             gain_w = gain_bbox[2] - gain_bbox[0]
             gain_x = (height - gain_w) // 2
             gain_y = y + text_h + 3  # 3-pixel spacing
-            draw_text.text((gain_x, gain_y), gain_str, font=gain_font, fill=0)
+            draw_text(black_img, (gain_x, gain_y), gain_str, gain_font, text_color)
 
-        mask = text_layer.point(lambda p: 255 if p < 128 else 0, mode='1')
-        black_img.paste(Image.new('1', (height, width), text_color), (0, 0), mask)
+        # Flag data the provider hasn't been able to refresh
+        stale = providers.age_label('youtube', snapshot, config)
+        if stale:
+            draw_badge(black_img, stale, get_font(font_path, int(font_size * 0.6)))
 
-        rotated_black = black_img.rotate(90, expand=True)
-        if invert:
-            rotated_black = Image.eval(rotated_black, lambda px: 255 - px)
-        if flip_screen:
-            rotated_black = rotated_black.rotate(180)  # flip upside-down
-        epd.display_fast(epd.getbuffer(rotated_black))
         logger.debug("YouTube dashboard rendered")
+        # Rotated to the panel, inverted and flipped while packing
+        return framebuffer.Frame(framebuffer.pack(black_img, epd.width, epd.height, flip=flip_screen, invert=invert))
 
     except Exception as e:
         logger.exception(f"YouTube rendering failed: {e}")
@@ -1,15 +1,238 @@
-from dashboards import clock, weather, stocks, youtube, text, image
-
-dashboards = {
-    "clock": clock.render,
-    "weather": weather.render,
-    "stocks": stocks.render,
-    "youtube": youtube.render,
-    "text": text.render,
-    "image": image.render
+import time
+import logging
+import importlib
+import threading
+from datetime import datetime
+from collections import namedtuple
+from importlib.metadata import entry_points
+from lib import refresh, metrics
+from lib.framebuffer import Frame
+
+logger = logging.getLogger(__name__)
+
+# Built-in dashboards: name -> (module with a render() function, label).
+# Modules are imported the first time a dashboard is rendered, so heavy
+# dependencies only load for dashboards that are actually shown.
+BUILTIN_DASHBOARDS = {
+    "clock": ("dashboards.clock", "Clock"),
+    "youtube": ("dashboards.youtube", "YouTube"),
+    "weather": ("dashboards.weather", "Weather"),
+    "stocks": ("dashboards.stocks", "Stocks"),
+    "text": ("dashboards.text", "Text"),
+    "image": ("dashboards.image", "Image"),
 }
 
-def show_dashboard(name, epd, config, flip_screen=False):
-    if name not in dashboards:
-        raise ValueError(f"No dashboard found for: {name}")
-    dashboards[name](epd, config, flip_screen=flip_screen)
+# Third-party packages add dashboards with an entry point in this group,
+# e.g. `myclock = my_package.dashboard:render` (a module with render() works too)
+ENTRY_POINT_GROUP = "eink_dashboard.dashboards"
+
+metrics.describe('dashboard_render_seconds', "Time a dashboard's render() took: data wait, fonts, drawing and packing")
+metrics.describe('dashboard_frames_total', "Frames shown by dashboard and source (rendered, prerendered, or none when rendering failed)")
+metrics.describe('display_push_seconds', "Time the display worker took to put a frame on the panel, busy time included")
+metrics.describe('display_frames_superseded_total', "Frames replaced by a newer one before they reached the panel")
+
+_plugins = None
+_renderers = {}
+
+def _plugin_entry_points():
+    global _plugins
+    if _plugins is None:
+        _plugins = {}
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            if ep.name in BUILTIN_DASHBOARDS:
+                logger.warning(f"Ignoring dashboard plugin {ep.value}: {ep.name} is a built-in dashboard")
+                continue
+            _plugins[ep.name] = ep
+    return _plugins
+
+def available_dashboards():
+    """(name, label) of every dashboard, built-ins first; nothing is imported."""
+    names = [(name, label) for name, (_, label) in BUILTIN_DASHBOARDS.items()]
+    names += [(name, name.replace('_', ' ').title()) for name in sorted(_plugin_entry_points())]
+    return names
+
+def get_renderer(name):
+    """The render function of a dashboard, importing its module on first use."""
+    if name not in _renderers:
+        if name in BUILTIN_DASHBOARDS:
+            target = importlib.import_module(BUILTIN_DASHBOARDS[name][0])
+        elif name in _plugin_entry_points():
+            target = _plugin_entry_points()[name].load()
+        else:
+            raise ValueError(f"No dashboard found for: {name}")
+        _renderers[name] = getattr(target, 'render', target)
+        logger.debug(f"Loaded dashboard: {name}")
+    return _renderers[name]
+
+# Render the next dashboard in the cycle this many seconds before it is due
+DEFAULT_PRERENDER_SECONDS = 20
+# A pre-rendered frame older than prerender_seconds plus this is redrawn instead of shown
+PRERENDER_SLACK_SECONDS = 5
+
+# A frame rendered ahead of time, with what it was rendered from and when (epoch seconds)
+PrerenderedFrame = namedtuple('PrerenderedFrame', ['name', 'frame', 'section', 'flip_screen', 'minute', 'rendered_at'])
+
+class FrameRecorder:
+    """Handed to render() in place of the EPD: same geometry, and it keeps
+    the buffer of dashboards that still push to the panel themselves
+    instead of returning a Frame."""
+
+    def __init__(self, epd):
+        self._epd = epd
+        self.width = epd.width
+        self.height = epd.height
+        self.frame = None
+
+    def getbuffer(self, image):
+        return self._epd.getbuffer(image)
+
+    def _record(self, image, partial):
+        self.frame = Frame(bytes(image), partial)
+        return True
+
+    def display(self, image):
+        return self._record(image, False)
+
+    def display_fast(self, image):
+        return self._record(image, False)
+
+    def displayPartial(self, image):
+        return self._record(image, True)
+
+    def displayPartBaseImage(self, image):
+        return self._record(image, True)
+
+class DisplayWorker:
+    """Owns the panel: pushes frames from its own thread so rendering the next
+    frame overlaps the current refresh.
+
+    Only one frame waits at a time; submitting a new one replaces a frame
+    that hasn't been sent yet, so rapid changes never queue stale refreshes.
+    Between frames the render loop can ask for the panel to be put into deep
+    sleep; the next frame wakes it.
+    """
+
+    def __init__(self, epd):
+        self.epd = epd
+        self._cond = threading.Condition()
+        self._pending = None  # (dashboard name, Frame)
+        self._busy = False
+        self._sleep_requested = False
+        self._last_shown = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='display', daemon=True)
+            self._thread.start()
+
+    def submit(self, name, frame):
+        with self._cond:
+            if self._pending is not None:
+                metrics.counter('display_frames_superseded_total').inc()
+                logger.debug(f"Dropping unsent {self._pending[0]} frame for a newer {name} frame")
+            self._pending = (name, frame)
+            self._sleep_requested = False
+            self._cond.notify_all()
+
+    def sleep_when_idle(self):
+        """Put the panel into deep sleep once every submitted frame is on it."""
+        with self._cond:
+            if not self._sleep_requested:
+                self._sleep_requested = True
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Block until every submitted frame (and requested sleep) is on the panel; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._pending is None and not self._sleep_requested and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._sleep_requested)
+                pending, self._pending = self._pending, None
+                if pending is None:
+                    self._sleep_requested = False
+                self._busy = True
+            try:
+                if pending is not None:
+                    self._push(*pending)
+                else:
+                    self.epd.deep_sleep()
+            except Exception as e:
+                if pending is not None:
+                    logger.exception(f"Failed to show {pending[0]} frame: {e}")
+                else:
+                    logger.exception(f"Failed to put the panel to sleep: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _push(self, name, frame):
+        if name != self._last_shown:
+            # A new dashboard replaces the whole screen; start partial updates from a fresh base image
+            refresh.scheduler.reset()
+            self._last_shown = name
+        with metrics.timer('display_push_seconds', metrics.DEFAULT_BUCKETS, dashboard=name):
+            if frame.partial:
+                refresh.scheduler.push(self.epd, frame.buffer, frame.full_refresh_every)
+            else:
+                self.epd.display_fast(frame.buffer)
+
+def render_frame(name, epd, config, flip_screen=False):
+    """Run a dashboard's render() without touching the panel; returns its Frame or None."""
+    render = get_renderer(name)
+    recorder = FrameRecorder(epd)
+    with metrics.timer('dashboard_render_seconds', dashboard=name):
+        frame = render(recorder, config, flip_screen=flip_screen)
+    return frame if frame is not None else recorder.frame
+
+def _current_minute():
+    return datetime.now().strftime('%Y-%m-%d %H:%M')
+
+def prerender_dashboard(name, epd, config, flip_screen=False):
+    """Render a dashboard ahead of time; returns a PrerenderedFrame or None."""
+    minute = _current_minute()
+    rendered_at = time.time()
+    frame = render_frame(name, epd, config, flip_screen=flip_screen)
+    if frame is None:
+        return None
+    logger.debug(f"Pre-rendered dashboard: {name}")
+    return PrerenderedFrame(name, frame, config.get(name), flip_screen, minute, rendered_at)
+
+def _prerendered_valid(frame, name, config, flip_screen):
+    if frame is None or frame.name != name or frame.flip_screen != flip_screen:
+        return False
+    if frame.section != config.get(name):
+        return False  # settings changed since it was drawn
+    if name == 'clock' and frame.minute != _current_minute():
+        return False
+    max_age = config.get('cycle', {}).get('prerender_seconds', DEFAULT_PRERENDER_SECONDS) + PRERENDER_SLACK_SECONDS
+    if time.time() - frame.rendered_at > max_age:
+        logger.debug(f"Pre-rendered {name} frame is {time.time() - frame.rendered_at:.0f}s old; redrawing")
+        return False  # its data may be stale, and it would carry no age badge
+    return True
+
+def show_dashboard(name, worker, config, flip_screen=False, prerendered=None):
+    """Render a dashboard (or use its pre-rendered frame) and hand it to the display worker.
+
+    Returns once the frame is queued (False if the dashboard failed to draw);
+    the refresh itself happens on the worker's thread.
+    """
+    if _prerendered_valid(prerendered, name, config, flip_screen):
+        logger.debug(f"Showing pre-rendered frame for {name}")
+        frame = prerendered.frame
+        source = 'prerendered'
+    else:
+        frame = render_frame(name, worker.epd, config, flip_screen=flip_screen)
+        source = 'rendered'
+    if frame is None:
+        metrics.counter('dashboard_frames_total', dashboard=name, source='none').inc()
+        logger.warning(f"Dashboard {name} produced no frame; keeping the current screen")
+        return False
+    metrics.counter('dashboard_frames_total', dashboard=name, source=source).inc()
+    worker.submit(name, frame)
+    return True
@@ -0,0 +1,89 @@
+import os
+import json
+import queue
+import socket
+import logging
+import threading
+import socketserver
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = '.eink-dashboard.sock'
+
+# Command kinds understood by the render loop
+SWITCH_DASHBOARD = 'switch_dashboard'  # arg: dashboard name
+RELOAD_SECTION = 'reload_section'      # arg: top-level config key, or None for everything
+FORCE_REFRESH = 'force_refresh'        # arg: unused
+
+Command = namedtuple('Command', ['kind', 'arg'])
+
+class CommandChannel:
+    """Queue of commands from the web UI to the render loop.
+
+    The web UI normally runs in the same process as the render loop, so
+    commands are handed over in memory. serve_socket() exposes the same
+    channel on a Unix socket for a web UI running as a separate process.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.listening = False
+        self._server = None
+
+    def send(self, kind, arg=None):
+        self._queue.put(Command(kind, arg))
+
+    def wait(self, timeout=None):
+        """Block until a command arrives or `timeout` expires; return all pending commands."""
+        self.listening = True
+        try:
+            commands = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                commands.append(self._queue.get_nowait())
+            except queue.Empty:
+                return commands
+
+    def serve_socket(self, path=SOCKET_PATH):
+        """Accept newline-delimited JSON commands on a Unix socket in a daemon thread."""
+        channel = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        msg = json.loads(line)
+                        channel.send(msg['kind'], msg.get('arg'))
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.warning(f"Ignoring malformed command {line!r}: {e}")
+
+        if os.path.exists(path):
+            os.remove(path)  # left over from a previous run
+        self._server = socketserver.UnixStreamServer(path, Handler)
+        threading.Thread(target=self._server.serve_forever, name='command-socket', daemon=True).start()
+        self.listening = True
+        logger.debug(f"Listening for commands on {path}")
+
+# Process-wide channel shared by main.py and web.py
+channel = CommandChannel()
+
+def send_to_socket(kind, arg=None, path=SOCKET_PATH):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(2)
+            sock.connect(path)
+            sock.sendall(json.dumps({'kind': kind, 'arg': arg}).encode() + b'\n')
+        return True
+    except OSError as e:
+        logger.warning(f"Could not reach render loop on {path}: {e}")
+        return False
+
+def notify(kind, arg=None):
+    """Deliver a command to the render loop, in-process if it runs here or over the socket."""
+    if channel.listening:
+        channel.send(kind, arg)
+        return True
+    return send_to_socket(kind, arg)
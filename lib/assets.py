@@ -0,0 +1,112 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageOps, ImageChops
+
+logger = logging.getLogger(__name__)
+
+# A full-screen 1-bit image is ~4 KB, so this holds every background and icon we ship
+ASSET_CACHE_BYTES = 256 * 1024
+CACHE_DIR = '.cache/assets'
+# Converted files on disk; every upload or edit adds one, so the oldest are deleted past this
+CACHE_DIR_BYTES = 4 * 1024 * 1024
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_lock = threading.Lock()
+
+def _image_bytes(img):
+    w, h = img.size
+    return (w + 7) // 8 * h
+
+def _convert(path, size, invert, smooth, resample):
+    img = Image.open(path)
+    if smooth:
+        # grayscale -> resize -> invert -> dither, as the dashboards did inline
+        img = img.convert('L')
+        if size and img.size != size:
+            img = img.resize(size, resample) if resample is not None else img.resize(size)
+        if invert:
+            img = ImageOps.invert(img)
+        return img.convert('1')
+    # dither first, then a nearest-neighbour resize (weather icons and backgrounds)
+    img = img.convert('1')
+    if size and img.size != size:
+        img = img.resize(size)
+    if invert:
+        img = ImageChops.invert(img)
+    return img
+
+def load_1bit(path, size=None, invert=False, smooth=True, resample=None, persist=True):
+    """Panel-ready 1-bit version of an image file, cached in memory and on disk.
+
+    The cache key includes the file's mtime, so edited or re-uploaded images
+    are converted again. The returned image is shared; paste it, don't draw on it.
+    """
+    global _cache_bytes
+    size = tuple(size) if size else None
+    key = (os.path.abspath(path), size, invert, smooth, resample, os.stat(path).st_mtime_ns)
+
+    with _lock:
+        img = _cache.get(key)
+        if img is not None:
+            _cache.move_to_end(key)
+            return img
+
+    cache_file = os.path.join(CACHE_DIR, hashlib.sha1(repr(key).encode()).hexdigest() + '.png')
+    img = None
+    if persist and os.path.exists(cache_file):
+        try:
+            img = Image.open(cache_file)
+            img.load()
+            os.utime(cache_file)  # mark as recently used; atime is often off (noatime) on a Pi
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable asset cache file {cache_file}: {e}")
+            img = None
+    if img is None:
+        logger.debug(f"Converting asset {path} (size={size}, invert={invert})")
+        img = _convert(path, size, invert, smooth, resample)
+        if persist:
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                img.save(cache_file)
+                prune_cache_dir()
+            except OSError as e:
+                logger.warning(f"Could not persist asset cache file {cache_file}: {e}")
+
+    with _lock:
+        if key not in _cache:
+            _cache[key] = img
+            _cache_bytes += _image_bytes(img)
+            while _cache_bytes > ASSET_CACHE_BYTES and len(_cache) > 1:
+                _, evicted = _cache.popitem(last=False)
+                _cache_bytes -= _image_bytes(evicted)
+    return img
+
+def prune_cache_dir(max_bytes=None):
+    """Delete the least recently used files in CACHE_DIR until it fits in `max_bytes`."""
+    max_bytes = CACHE_DIR_BYTES if max_bytes is None else max_bytes
+    entries = []
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith('.png'):
+                st = entry.stat()
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            total -= size  # another thread got to it first
+    logger.debug(f"Asset cache directory holds {total} bytes")
+
+def clear_cache():
+    global _cache_bytes
+    with _lock:
+        _cache.clear()
+        _cache_bytes = 0
@@ -0,0 +1,62 @@
+from datetime import datetime, time, timedelta
+import numpy as np
+
+def downsample(columns, values):
+    """Reduce samples to at most four per pixel column: first, min, max and last.
+
+    `columns` is the non-decreasing pixel column of each sample. Drawing a
+    line through the result covers exactly the pixels a line through every
+    sample would, so a year of history costs no more to draw than the
+    chart is wide.
+    """
+    if len(columns) == 0:
+        return columns, values
+    starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+    ends = np.r_[starts[1:], len(columns)] - 1
+    out_columns = np.repeat(columns[starts], 4)
+    out_values = np.empty(len(starts) * 4, dtype=values.dtype)
+    out_values[0::4] = values[starts]
+    out_values[1::4] = np.minimum.reduceat(values, starts)
+    out_values[2::4] = np.maximum.reduceat(values, starts)
+    out_values[3::4] = values[ends]
+    return out_columns, out_values
+
+def day_starts(timestamps):
+    """Index of the first sample of each local calendar day in sorted epoch `timestamps`."""
+    if len(timestamps) == 0:
+        return np.empty(0, dtype=np.intp)
+    first = datetime.fromtimestamp(int(timestamps[0])).date()
+    last = datetime.fromtimestamp(int(timestamps[-1])).date()
+    midnights = [datetime.combine(first + timedelta(days=i), time()).timestamp()
+                 for i in range(1, (last - first).days + 1)]
+    indices = np.searchsorted(timestamps, midnights, side='left')
+    return np.unique(np.r_[0, indices])
+
+def draw_series(draw, box, timestamps, values, day_ticks=True, fill=0):
+    """Draw a line chart of `values` over epoch `timestamps` inside box (x, y, w, h).
+
+    With `day_ticks`, a vertical line drops from the first sample of every day
+    (and from the last sample) to the bottom of the box.
+    """
+    if len(values) < 2:
+        return
+    x, y, w, h = box
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values)
+    min_val, max_val = values.min(), values.max()
+    val_range = (max_val - min_val) or 1
+    time_start = timestamps[0]
+    time_range = (timestamps[-1] - time_start) or 1
+
+    columns = x + ((timestamps - time_start) / time_range * (w - 1)).astype(np.int64)
+    rows = y + h - 2 - ((values - min_val) / val_range * (h - 3)).astype(np.int64)
+
+    if day_ticks:
+        ticks = np.r_[day_starts(timestamps), len(values) - 1]
+        bottom = y + h - 1
+        for px, py in zip(columns[ticks].tolist(), rows[ticks].tolist()):
+            draw.line([(px, bottom), (px, py + 1)], fill=fill)
+
+    line_columns, line_values = downsample(columns, values)
+    line_rows = y + h - 2 - ((line_values - min_val) / val_range * (h - 3)).astype(np.int64)
+    draw.line(list(zip(line_columns.tolist(), line_rows.tolist())), fill=fill)
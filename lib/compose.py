@@ -0,0 +1,25 @@
+from PIL import Image, ImageDraw
+
+# Anti-aliased glyph coverage -> ink: the same 50% cut the dashboards used to apply per pixel
+_THRESHOLD = [255 if p < 128 else 0 for p in range(256)]
+
+def draw_badge(img, text, font, margin=2, padding=1):
+    """Draw `text` white-on-black in the top-left corner, readable over any background."""
+    draw = ImageDraw.Draw(img)
+    left, top, right, bottom = font.getbbox(text)
+    box = (margin, margin, margin + right - left + 2 * padding, margin + bottom - top + 2 * padding)
+    draw.rectangle(box, fill=0)
+    draw.text((margin + padding - left, margin + padding - top), text, font=font, fill=255)
+
+def draw_text(img, xy, text, font, fill):
+    """Draw `text` onto 1-bit `img`, thresholding the anti-aliased glyphs.
+
+    Only a layer the size of the text is rasterized, instead of a full-frame
+    grayscale copy of the canvas; the result is identical.
+    """
+    left, top, right, bottom = font.getbbox(text)
+    if right <= left or bottom <= top:
+        return
+    layer = Image.new('L', (right - left, bottom - top), 255)
+    ImageDraw.Draw(layer).text((-left, -top), text, font=font, fill=0)
+    img.paste(fill, (xy[0] + left, xy[1] + top), layer.point(_THRESHOLD, '1'))
@@ -27,16 +27,89 @@
 # THE SOFTWARE.
 #
 
+import time
 import logging
-from lib.epdconfig import RaspberryPi
+import hashlib
+from lib import metrics
+from lib.epdconfig import create_backend
 
-epdconfig = RaspberryPi()
+epdconfig = create_backend()
 epdconfig.module_exit(cleanup=True)
 
+def use_backend(name):
+    """Switch the hardware interface ('hardware' or 'simulated') before creating an EPD."""
+    global epdconfig
+    epdconfig = create_backend(name)
+
 # Display resolution
 EPD_WIDTH       = 122
 EPD_HEIGHT      = 250
 
+# Windowed RAM writes only pay off while the changed area is small
+WINDOW_MAX_FRACTION = 0.5
+
+# A full refresh takes a few seconds; BUSY staying high much longer means the panel is wedged
+BUSY_TIMEOUT_SECONDS = 30
+
+metrics.describe('epd_busy_seconds', "Time the panel held BUSY, by what it was doing")
+metrics.describe('epd_busy_timeouts_total', "BUSY waits that timed out and reset the controller")
+metrics.describe('epd_spi_transfer_seconds', "Time spent on bulk SPI data transfers (RAM writes)")
+metrics.describe('epd_spi_bytes_total', "Bytes sent in bulk SPI data transfers")
+metrics.describe('epd_sleeps_total', "Times the panel was put into deep sleep between refreshes")
+metrics.describe('epd_wake_seconds', "Time taken to wake the panel from deep sleep (reset and fast register setup)")
+metrics.describe('epd_frames_total', "Frames handed to the driver, by whether they were pushed or skipped as unchanged")
+
+class EPDBusyTimeout(RuntimeError):
+    """The panel never released BUSY. The controller has been reset; the next update re-initializes it."""
+
+# Register sequences as (command, data) pairs, sent with EPD.send_sequence()
+def window_sequence(x_start, y_start, x_end, y_end):
+    # x point must be the multiple of 8 or the last 3 bits will be ignored
+    return ((0x44, bytes(((x_start >> 3) & 0xFF, (x_end >> 3) & 0xFF))),  # SET_RAM_X_ADDRESS_START_END_POSITION
+            (0x45, bytes((y_start & 0xFF, (y_start >> 8) & 0xFF,           # SET_RAM_Y_ADDRESS_START_END_POSITION
+                          y_end & 0xFF, (y_end >> 8) & 0xFF))))
+
+def cursor_sequence(x, y):
+    return ((0x4E, bytes((x & 0xFF,))),                          # SET_RAM_X_ADDRESS_COUNTER
+            (0x4F, bytes((y & 0xFF, (y >> 8) & 0xFF))))          # SET_RAM_Y_ADDRESS_COUNTER
+
+FULL_WINDOW_SEQUENCE = window_sequence(0, 0, EPD_WIDTH - 1, EPD_HEIGHT - 1) + cursor_sequence(0, 0)
+
+INIT_SEQUENCE = (
+    (0x01, b'\xf9\x00\x00'),   # Driver output control
+    (0x11, b'\x03'),           # data entry mode
+) + FULL_WINDOW_SEQUENCE + (
+    (0x3c, b'\x05'),
+    (0x21, b'\x00\x80'),       # Display update control
+    (0x18, b'\x80'),
+)
+
+FAST_INIT_SEQUENCE = (
+    (0x18, b''),               # Read built-in temperature sensor
+    (0x80, b''),
+    (0x11, b'\x03'),           # data entry mode
+) + FULL_WINDOW_SEQUENCE + (
+    (0x22, b'\xB1'),           # Load temperature value
+    (0x20, b''),
+)
+
+FAST_TEMPERATURE_SEQUENCE = (
+    (0x1A, b'\x64\x00'),       # Write to temperature register
+    (0x22, b'\x91'),           # Load temperature value
+    (0x20, b''),
+)
+
+PARTIAL_SEQUENCE = (
+    (0x3C, b'\x80'),           # BorderWavefrom
+    (0x01, b'\xF9\x00\x00'),   # Driver output control
+    (0x11, b'\x03'),           # data entry mode
+)
+
+# Display Update Control with the given update mode, then Activate Display Update Sequence
+TURN_ON_SEQUENCE = ((0x22, b'\xf7'), (0x20, b''))
+TURN_ON_FAST_SEQUENCE = ((0x22, b'\xC7'), (0x20, b''))    # fast:0x0c, quality:0x0f, 0xcf
+TURN_ON_PART_SEQUENCE = ((0x22, b'\xff'), (0x20, b''))
+
 logger = logging.getLogger(__name__)
 
 class EPD:
@@ -47,6 +120,25 @@ class EPD:
         self.cs_pin = epdconfig.CS_PIN
         self.width = EPD_WIDTH
         self.height = EPD_HEIGHT
+
+        # Frame identity: digest of the last buffer sent to the panel
+        self._last_frame_digest = None
+        self._pending_digest = None
+
+        # displayPartial resets the controller, dropping the fast-mode LUT
+        self._needs_fast_init = False
+
+        # In deep sleep between refreshes; the next update wakes the panel first
+        self.asleep = False
+
+        # Shadow of the black RAM (0x24) for dirty-rectangle writes
+        self._ram = None
+        self._window_dirty = True  # RAM window no longer covers the full panel
+
+        # Last level written to the DC pin, so repeated data/command writes skip the GPIO call
+        self._dc = None
+
+        self.busy_timeout = BUSY_TIMEOUT_SECONDS
         
     '''
     function :Hardware reset
@@ -66,10 +158,8 @@ class EPD:
      command : Command register
     '''
     def send_command(self, command):
-        epdconfig.digital_write(self.dc_pin, 0)
-        epdconfig.digital_write(self.cs_pin, 0)
+        self._set_dc(0)
         epdconfig.spi_writebyte([command])
-        epdconfig.digital_write(self.cs_pin, 1)
 
     '''
     function :send data
@@ -77,57 +167,88 @@ class EPD:
      data : Write data
     '''
     def send_data(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
+        self._set_dc(1)
         epdconfig.spi_writebyte([data])
-        epdconfig.digital_write(self.cs_pin, 1)
 
     # send a lot of data   
     def send_data2(self, data):
-        epdconfig.digital_write(self.dc_pin, 1)
-        epdconfig.digital_write(self.cs_pin, 0)
-        epdconfig.spi_writebyte2(data)
-        epdconfig.digital_write(self.cs_pin, 1)
+        self._set_dc(1)
+        with metrics.timer('epd_spi_transfer_seconds'):
+            epdconfig.spi_writebyte2(data)
+        metrics.counter('epd_spi_bytes_total').inc(len(data))
+
+    '''
+    function :send register writes
+    parameter:
+     sequence : (command, data) pairs; each is one command byte and one data transfer
+    '''
+    def send_sequence(self, sequence):
+        for command, data in sequence:
+            self._set_dc(0)
+            epdconfig.spi_writebyte([command])
+            if data:
+                self._set_dc(1)
+                epdconfig.spi_writebyte2(data)
+
+    # CS is driven by the SPI controller; only DC needs toggling, and only when it changes
+    def _set_dc(self, level):
+        if self._dc != level:
+            epdconfig.digital_write(self.dc_pin, level)
+            self._dc = level
     
     '''
     function :Wait until the busy_pin goes LOW
     parameter:
+     mode : what the panel is busy with, for the busy-time histogram
     '''
-    def ReadBusy(self):
+    def ReadBusy(self, mode='command'):
         logger.debug("e-Paper busy")
-        while(epdconfig.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
-            epdconfig.delay_ms(10)  
-        logger.debug("e-Paper busy release")
+        start = time.monotonic()
+        released = epdconfig.wait_busy_release(self.busy_timeout)
+        elapsed = time.monotonic() - start
+        metrics.histogram('epd_busy_seconds', mode=mode).observe(elapsed)
+        if not released:
+            metrics.counter('epd_busy_timeouts_total').inc()
+            self.recover()
+            raise EPDBusyTimeout(f"e-Paper still busy after {elapsed:.1f}s ({mode})")
+        logger.debug(f"e-Paper busy release after {elapsed * 1000:.0f}ms ({mode})")
+
+    '''
+    function :Hardware reset after a timeout; forgets all panel state so the next update starts clean
+    parameter:
+    '''
+    def recover(self):
+        logger.warning("Resetting e-Paper controller")
+        self.reset()
+        self._needs_fast_init = True
+        self.asleep = False
+        self._ram = None
+        self._window_dirty = True
+        self.invalidate_frame()
 
     '''
     function : Turn On Display
     parameter:
     '''
     def TurnOnDisplay(self):
-        self.send_command(0x22) # Display Update Control
-        self.send_data(0xf7)
-        self.send_command(0x20) # Activate Display Update Sequence
-        self.ReadBusy()
+        self.send_sequence(TURN_ON_SEQUENCE)
+        self.ReadBusy('full')
 
     '''
     function : Turn On Display Fast
     parameter:
     '''
     def TurnOnDisplay_Fast(self):
-        self.send_command(0x22) # Display Update Control
-        self.send_data(0xC7)    # fast:0x0c, quality:0x0f, 0xcf
-        self.send_command(0x20) # Activate Display Update Sequence
-        self.ReadBusy()
+        self.send_sequence(TURN_ON_FAST_SEQUENCE)
+        self.ReadBusy('fast')
     
     '''
     function : Turn On Display Part
     parameter:
     '''
     def TurnOnDisplayPart(self):
-        self.send_command(0x22) # Display Update Control
-        self.send_data(0xff)    # fast:0x0c, quality:0x0f, 0xcf
-        self.send_command(0x20) # Activate Display Update Sequence
-        self.ReadBusy()
+        self.send_sequence(TURN_ON_PART_SEQUENCE)
+        self.ReadBusy('partial')
 
 
     '''
@@ -139,16 +260,7 @@ class EPD:
         yend : End position of Y-axis
     '''
     def SetWindow(self, x_start, y_start, x_end, y_end):
-        self.send_command(0x44) # SET_RAM_X_ADDRESS_START_END_POSITION
-        # x point must be the multiple of 8 or the last 3 bits will be ignored
-        self.send_data((x_start>>3) & 0xFF)
-        self.send_data((x_end>>3) & 0xFF)
-        
-        self.send_command(0x45) # SET_RAM_Y_ADDRESS_START_END_POSITION
-        self.send_data(y_start & 0xFF)
-        self.send_data((y_start >> 8) & 0xFF)
-        self.send_data(y_end & 0xFF)
-        self.send_data((y_end >> 8) & 0xFF)
+        self.send_sequence(window_sequence(x_start, y_start, x_end, y_end))
 
     '''
     function : Set Cursor
@@ -157,13 +269,7 @@ class EPD:
         y : Y-axis starting position
     '''
     def SetCursor(self, x, y):
-        self.send_command(0x4E) # SET_RAM_X_ADDRESS_COUNTER
-        # x point must be the multiple of 8 or the last 3 bits will be ignored
-        self.send_data(x & 0xFF)
-        
-        self.send_command(0x4F) # SET_RAM_Y_ADDRESS_COUNTER
-        self.send_data(y & 0xFF)
-        self.send_data((y >> 8) & 0xFF)
+        self.send_sequence(cursor_sequence(x, y))
     
     '''
     function : Initialize the e-Paper register
@@ -172,35 +278,22 @@ class EPD:
     def init(self):
         if (epdconfig.module_init() != 0):
             return -1
+        self._dc = None  # module_init recreated the pins
+        # the panel may have been powered off (sleep()); its RAM holds nothing we know of
+        self._ram = None
+        self._window_dirty = True
+        self.invalidate_frame()
         # EPD hardware init start
         self.reset()
         
-        self.ReadBusy()
+        self.ReadBusy('init')
         self.send_command(0x12)  #SWRESET
-        self.ReadBusy() 
-
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0xf9)
-        self.send_data(0x00)
-        self.send_data(0x00)
-    
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
-
-        self.SetWindow(0, 0, self.width-1, self.height-1)
-        self.SetCursor(0, 0)
-        
-        self.send_command(0x3c)
-        self.send_data(0x05)
+        self.ReadBusy('init') 
 
-        self.send_command(0x21) #  Display update control
-        self.send_data(0x00)
-        self.send_data(0x80)
-    
-        self.send_command(0x18)
-        self.send_data(0x80)
+        self.send_sequence(INIT_SEQUENCE)
+        self._window_dirty = False
         
-        self.ReadBusy()
+        self.ReadBusy('init')
         
         return 0
 
@@ -211,37 +304,137 @@ class EPD:
     def init_fast(self):
         if (epdconfig.module_init() != 0):
             return -1
+        self._dc = None  # module_init recreated the pins
+        # the panel may have been powered off (sleep()); its RAM holds nothing we know of
+        self._ram = None
+        self._window_dirty = True
+        self.invalidate_frame()
+        return self.reinit_fast()
+
+    '''
+    function : Re-run the fast register setup on an already open bus
+               (needed after a partial refresh has reset the controller)
+    parameter:
+    '''
+    def reinit_fast(self):
         # EPD hardware init start
         self.reset()
 
         self.send_command(0x12)  #SWRESET
-        self.ReadBusy() 
+        self.ReadBusy('init') 
 
-        self.send_command(0x18) # Read built-in temperature sensor
-        self.send_command(0x80)
+        self.send_sequence(FAST_INIT_SEQUENCE)
+        self._window_dirty = False
+        self.ReadBusy('init')
 
-        self.send_command(0x11) # data entry mode       
-        self.send_data(0x03)    
+        self.send_sequence(FAST_TEMPERATURE_SEQUENCE)
+        self.ReadBusy('init')
 
-        self.SetWindow(0, 0, self.width-1, self.height-1)
-        self.SetCursor(0, 0)
-        
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0xB1)	
-        self.send_command(0x20)
-        self.ReadBusy()
-
-        self.send_command(0x1A) # Write to temperature register
-        self.send_data(0x64)
-        self.send_data(0x00)
-                        
-        self.send_command(0x22) # Load temperature value
-        self.send_data(0x91)	
-        self.send_command(0x20)
-        self.ReadBusy()
-        
+        self._needs_fast_init = False
+        self.asleep = False
         return 0
     '''
+    function : Set the controller up before an update: wake it from deep sleep, or
+               redo the fast register setup after a reset (partial refresh, timeout)
+    parameter:
+    '''
+    def _ensure_init(self):
+        if self.asleep:
+            self.wake()
+        elif self._needs_fast_init:
+            self.reinit_fast()
+
+    '''
+    function : Check whether a buffer is already on the panel
+    parameter:
+        image : Image data
+    '''
+    def frame_unchanged(self, image):
+        digest = hashlib.sha1(bytes(image)).digest()
+        if digest == self._last_frame_digest:
+            metrics.counter('epd_frames_total', result='skipped').inc()
+            logger.debug(f"Frame unchanged, skipping refresh ({self.frames_skipped} skipped, {self.frames_pushed} pushed)")
+            return True
+        self._pending_digest = digest
+        return False
+
+    # record the frame checked by frame_unchanged() as being on the panel
+    def _frame_pushed(self):
+        self._last_frame_digest = self._pending_digest
+        metrics.counter('epd_frames_total', result='pushed').inc()
+
+    # frame counts are kept in lib.metrics as epd_frames_total
+    @property
+    def frames_pushed(self):
+        return metrics.counter('epd_frames_total', result='pushed').value
+
+    @property
+    def frames_skipped(self):
+        return metrics.counter('epd_frames_total', result='skipped').value
+
+    '''
+    function : Forget the last frame so the next one is always sent
+    parameter:
+    '''
+    def invalidate_frame(self):
+        self._last_frame_digest = None
+
+    '''
+    function : Byte-aligned bounding box of the bytes that differ between two buffers
+    parameter:
+        old : Previous image data
+        new : New image data
+    return : (x_start, y_start, x_end, y_end) in bytes/rows, or None if identical
+    '''
+    def dirty_window(self, old, new):
+        linewidth = (self.width + 7) // 8
+        rows = [y for y in range(self.height)
+                if old[y * linewidth:(y + 1) * linewidth] != new[y * linewidth:(y + 1) * linewidth]]
+        if not rows:
+            return None
+        cols = [x for x in range(linewidth) if old[x::linewidth] != new[x::linewidth]]
+        return cols[0], rows[0], cols[-1], rows[-1]
+
+    # point the RAM window back at the whole panel after a windowed write
+    def _full_window(self):
+        if self._window_dirty:
+            self.send_sequence(FULL_WINDOW_SEQUENCE)
+            self._window_dirty = False
+
+    '''
+    function : Write an image buffer to the black RAM, sending only the changed window
+    parameter:
+        image : Image data
+    '''
+    def write_ram(self, image):
+        buf = bytes(image)
+        linewidth = (self.width + 7) // 8
+        window = None
+        if self._ram is not None and len(buf) == len(self._ram) == linewidth * self.height:
+            window = self.dirty_window(self._ram, buf)
+            if window is None:
+                logger.debug("RAM already holds this frame")
+                return
+            x_start, y_start, x_end, y_end = window
+            area = (x_end - x_start + 1) * (y_end - y_start + 1)
+            if area > WINDOW_MAX_FRACTION * len(buf):
+                window = None
+
+        if window is None:
+            self._full_window()
+            self.send_command(0x24)
+            self.send_data2(buf)
+        else:
+            logger.debug(f"Writing RAM window x={x_start}-{x_end} (bytes) y={y_start}-{y_end}")
+            self.send_sequence(window_sequence(x_start * 8, y_start, x_end * 8 + 7, y_end)
+                               + cursor_sequence(x_start, y_start))
+            self._window_dirty = True
+            self.send_command(0x24)
+            self.send_data2(b''.join(buf[y * linewidth + x_start:y * linewidth + x_end + 1]
+                                     for y in range(y_start, y_end + 1)))
+        self._ram = buf
+
+    '''
     function : Display images
     parameter:
         image : Image data
@@ -268,9 +461,13 @@ class EPD:
         image : Image data
     '''
     def display(self, image):
-        self.send_command(0x24)
-        self.send_data2(image)  
+        if self.frame_unchanged(image):
+            return False
+        self._ensure_init()
+        self.write_ram(image)
         self.TurnOnDisplay()
+        self._frame_pushed()
+        return True
     
     '''
     function : Sends the image buffer in RAM to e-Paper and fast displays
@@ -278,36 +475,42 @@ class EPD:
         image : Image data
     '''
     def display_fast(self, image):
-        self.send_command(0x24)
-        self.send_data2(image) 
+        if self.frame_unchanged(image):
+            return False
+        self._ensure_init()
+        self.write_ram(image)
         self.TurnOnDisplay_Fast()
+        self._frame_pushed()
+        return True
     '''
     function : Sends the image buffer in RAM to e-Paper and partial refresh
     parameter:
         image : Image data
     '''
     def displayPartial(self, image):
-        epdconfig.digital_write(self.reset_pin, 0)
-        epdconfig.delay_ms(1)
-        epdconfig.digital_write(self.reset_pin, 1)  
-
-        self.send_command(0x3C) # BorderWavefrom
-        self.send_data(0x80)
-
-        self.send_command(0x01) # Driver output control      
-        self.send_data(0xF9) 
-        self.send_data(0x00)
-        self.send_data(0x00)
+        if self.frame_unchanged(image):
+            return False
+        self._needs_fast_init = True
+        if self.asleep:
+            # leaving deep sleep needs the full reset and time for the oscillator
+            # and analog block to start; RAM survived the sleep
+            with metrics.timer('epd_wake_seconds'):
+                self.reset()
+                self.ReadBusy('init')
+            self.asleep = False
+        else:
+            epdconfig.digital_write(self.reset_pin, 0)
+            epdconfig.delay_ms(1)
+            epdconfig.digital_write(self.reset_pin, 1)  
 
-        self.send_command(0x11) # data entry mode       
-        self.send_data(0x03)
+        self.send_sequence(PARTIAL_SEQUENCE)
 
-        self.SetWindow(0, 0, self.width - 1, self.height - 1)
-        self.SetCursor(0, 0)
-        
-        self.send_command(0x24) # WRITE_RAM
-        self.send_data2(image)  
+        # the reset dropped the RAM window; write_ram sets it up again
+        self._window_dirty = True
+        self.write_ram(image) # WRITE_RAM
         self.TurnOnDisplayPart()
+        self._frame_pushed()
+        return True
 
     '''
     function : Refresh a base image
@@ -315,12 +518,16 @@ class EPD:
         image : Image data
     '''
     def displayPartBaseImage(self, image):
-        self.send_command(0x24)
-        self.send_data2(image)  
-                
+        if self.frame_unchanged(image):
+            return False
+        self._ensure_init()
+        self.write_ram(image)
+        self._full_window()
         self.send_command(0x26)
         self.send_data2(image)  
         self.TurnOnDisplay()
+        self._frame_pushed()
+        return True
     
     '''
     function : Clear screen
@@ -333,9 +540,39 @@ class EPD:
             linewidth = int(self.width/8) + 1
         # logger.debug(linewidth)
         
+        self._ensure_init()
+        self._full_window()
         self.send_command(0x24)
         self.send_data2([color] * int(self.height * linewidth))  
+        self._ram = bytes([color] * int(self.height * linewidth))
         self.TurnOnDisplay()
+        self.invalidate_frame()
+
+    '''
+    function : Enter deep sleep between refreshes; SPI and GPIO stay open for wake()
+    parameter:
+    '''
+    def deep_sleep(self):
+        if self.asleep:
+            return
+        self.send_command(0x10) #enter deep sleep mode 1, RAM is retained
+        self.send_data(0x01)
+        self.asleep = True
+        # a hardware reset is the only way out; wake() redoes the register setup after it
+        self._needs_fast_init = True
+        metrics.counter('epd_sleeps_total').inc()
+        logger.debug("e-Paper in deep sleep")
+
+    '''
+    function : Leave deep sleep with a reset and the fast register setup, reusing the open bus
+    parameter:
+    '''
+    def wake(self):
+        if not self.asleep:
+            return
+        with metrics.timer('epd_wake_seconds') as timer:
+            self.reinit_fast()
+        logger.debug(f"e-Paper woke in {timer.seconds * 1000:.0f}ms")
 
     '''
     function : Enter sleep mode
@@ -31,11 +31,12 @@ import os
 import logging
 import time
 from ctypes import CDLL
-import spidev
-import gpiozero
 
 logger = logging.getLogger(__name__)
 
+# Overrides the configured backend, e.g. EPD_BACKEND=simulated on a dev box
+BACKEND_ENV = 'EPD_BACKEND'
+
 class RaspberryPi:
     # Pin definition
     RST_PIN  = 17
@@ -53,6 +54,10 @@ class RaspberryPi:
         self.DEV_SPI = None
 
     def module_init(self, cleanup=False):
+        # Imported here so the driver can be loaded (and simulated) without Pi libraries
+        import spidev
+        import gpiozero
+
         # Initialize GPIO
         self.GPIO_RST_PIN = gpiozero.LED(self.RST_PIN)
         self.GPIO_DC_PIN  = gpiozero.LED(self.DC_PIN)
@@ -118,6 +123,10 @@ class RaspberryPi:
             return self.GPIO_BUSY_PIN.value
         return 0
 
+    def wait_busy_release(self, timeout):
+        # Woken by gpiozero's edge detection; False if BUSY is still high after `timeout` seconds
+        return self.GPIO_BUSY_PIN.wait_for_release(timeout)
+
     def delay_ms(self, delaytime):
         time.sleep(delaytime / 1000.0)
 
@@ -129,4 +138,14 @@ class RaspberryPi:
         if self.SPI:
             self.SPI.writebytes2(data)
 
-### END OF FILE ###
\ No newline at end of file
+def create_backend(name=None):
+    """The hardware interface: 'hardware' (SPI/GPIO on a Pi) or 'simulated'."""
+    name = os.environ.get(BACKEND_ENV) or name or 'hardware'
+    if name == 'hardware':
+        return RaspberryPi()
+    if name == 'simulated':
+        from lib.epdsim import SimulatedPanel
+        return SimulatedPanel()
+    raise ValueError(f"Unknown EPD backend: {name}")
+
+### END OF FILE ###
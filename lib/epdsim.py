@@ -0,0 +1,192 @@
+import os
+import time
+import logging
+from collections import Counter
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+PANEL_WIDTH = 122
+PANEL_HEIGHT = 250
+LINE_BYTES = (PANEL_WIDTH + 7) // 8
+
+# How long BUSY stays high, roughly as measured on a 2.13" V4 panel at room temperature
+BUSY_SECONDS = {
+    'full': 2.0,
+    'fast': 1.5,
+    'partial': 0.4,
+    'temperature': 0.1,
+    'reset': 0.01,
+    'update': 1.0,  # any other 0x22 sequence
+}
+
+# Display Update Control (0x22) values the driver uses
+UPDATE_MODES = {0xF7: 'full', 0xC7: 'fast', 0xFF: 'partial', 0xB1: 'temperature', 0x91: 'temperature'}
+DISPLAY_MODES = ('full', 'fast', 'partial', 'update')
+
+# Data bytes each register command takes
+COMMAND_ARGS = {0x44: 2, 0x45: 4, 0x4E: 1, 0x4F: 2, 0x22: 1, 0x11: 1, 0x10: 1}
+
+OUTPUT_ENV = 'EPD_SIM_OUTPUT'
+DEFAULT_OUTPUT_DIR = '.cache/epd-sim'
+# Multiplies every simulated delay; 0 runs as fast as possible but still reports busy times
+TIME_SCALE_ENV = 'EPD_SIM_TIME_SCALE'
+
+class SimulatedPanel:
+    """Stands in for the SPI/GPIO interface in lib/epdconfig.py.
+
+    Decodes the command stream the EPD driver sends: RAM window, cursor,
+    0x24/0x26 RAM writes, update sequences and deep sleep (which ignores
+    everything until the next hardware reset). Every refresh saves the black
+    RAM as a PNG (in the orientation the dashboards draw) and holds BUSY for
+    as long as that refresh mode takes on a real panel.
+    """
+
+    RST_PIN  = 17
+    DC_PIN   = 25
+    CS_PIN   = 8
+    BUSY_PIN = 24
+    PWR_PIN  = 18
+
+    def __init__(self, output_dir=None, time_scale=None):
+        self.output_dir = output_dir if output_dir is not None else os.environ.get(OUTPUT_ENV, DEFAULT_OUTPUT_DIR)
+        self.time_scale = time_scale if time_scale is not None else float(os.environ.get(TIME_SCALE_ENV, 1))
+        self.ram = {0x24: bytearray(b'\xff' * LINE_BYTES * PANEL_HEIGHT),
+                    0x26: bytearray(b'\xff' * LINE_BYTES * PANEL_HEIGHT)}
+        self.refreshes = Counter()   # refresh mode -> count
+        self.busy_total = Counter()  # refresh mode -> simulated seconds
+        self.bytes_written = 0
+        self.frames = 0
+        self.sleeps = 0
+        self.asleep = False
+        self._dc = 0
+        self._command = None
+        self._args = bytearray()
+        self._busy_until = 0.0
+        self._reset_registers()
+
+    def _reset_registers(self):
+        self._window = (0, LINE_BYTES - 1, 0, PANEL_HEIGHT - 1)  # x bytes, y rows, inclusive
+        self._cursor = (0, 0)
+        self._update = None
+
+    def module_init(self, cleanup=False):
+        logger.info(f"Using simulated e-Paper panel, frames saved to {self.output_dir or 'nowhere'}")
+        return 0
+
+    def module_exit(self, cleanup=False):
+        pass
+
+    def digital_write(self, pin, value):
+        if pin == self.DC_PIN:
+            self._dc = value
+        elif pin == self.RST_PIN and not value:
+            # RAM survives a hardware reset (and deep sleep mode 1); the registers don't
+            self._reset_registers()
+            self._command = None
+            self.asleep = False
+
+    def digital_read(self, pin):
+        if pin == self.BUSY_PIN:
+            return 1 if time.monotonic() < self._busy_until else 0
+        return 0
+
+    def wait_busy_release(self, timeout):
+        remaining = self._busy_until - time.monotonic()
+        if remaining <= 0:
+            return True
+        time.sleep(min(remaining, timeout))
+        return remaining <= timeout
+
+    def delay_ms(self, delaytime):
+        if self.time_scale:
+            time.sleep(delaytime / 1000.0 * self.time_scale)
+
+    def spi_writebyte(self, data):
+        self.spi_writebyte2(data)
+
+    def spi_writebyte2(self, data):
+        data = bytes(data)
+        self.bytes_written += len(data)
+        if self.asleep:
+            logger.warning(f"Ignoring {len(data)} byte(s) sent while the panel is in deep sleep")
+            return
+        if self._dc == 0:
+            for command in data:
+                self._begin(command)
+        elif self._command in (0x24, 0x26):
+            self._write_ram(data)
+        elif self._command in COMMAND_ARGS:
+            for value in data:
+                self._args.append(value)
+                if len(self._args) == COMMAND_ARGS[self._command]:
+                    self._apply(self._command, self._args)
+
+    def _begin(self, command):
+        self._command = command
+        self._args = bytearray()
+        if command in (0x24, 0x26):
+            self._ram_pos = self._cursor
+        elif command == 0x12:  # SWRESET
+            self._reset_registers()
+            self._busy('reset')
+        elif command == 0x20:  # Activate Display Update Sequence
+            mode = UPDATE_MODES.get(self._update, 'update')
+            if mode in DISPLAY_MODES:
+                self._save_frame(mode)
+            self._busy(mode)
+
+    def _apply(self, command, args):
+        if command == 0x44:
+            self._window = (args[0], args[1]) + self._window[2:]
+        elif command == 0x45:
+            self._window = self._window[:2] + (args[0] | args[1] << 8, args[2] | args[3] << 8)
+        elif command == 0x4E:
+            self._cursor = (args[0], self._cursor[1])
+        elif command == 0x4F:
+            self._cursor = (self._cursor[0], args[0] | args[1] << 8)
+        elif command == 0x22:
+            self._update = args[0]
+        elif command == 0x10 and args[0] & 0x03:  # Deep Sleep Mode
+            self.asleep = True
+            self.sleeps += 1
+
+    def _write_ram(self, data):
+        # Data entry mode 0x03: x increments, then y; the address wraps inside the window
+        x_start, x_end, y_start, y_end = self._window
+        ram = self.ram[self._command]
+        x, y = self._ram_pos
+        pos = 0
+        while pos < len(data):
+            n = min(x_end - x + 1, len(data) - pos)
+            if n <= 0 or not 0 <= y < PANEL_HEIGHT:
+                break  # cursor outside the window or panel; the controller ignores such writes
+            offset = y * LINE_BYTES + x
+            ram[offset:offset + n] = data[pos:pos + n]
+            pos += n
+            x += n
+            if x > x_end:
+                x = x_start
+                y = y_start if y >= y_end else y + 1
+        self._ram_pos = (x, y)
+
+    def _busy(self, mode):
+        seconds = BUSY_SECONDS[mode]
+        self.refreshes[mode] += 1
+        self.busy_total[mode] += seconds
+        self._busy_until = time.monotonic() + seconds * self.time_scale
+
+    def image(self):
+        """The black RAM as the dashboards drew it: landscape, black on white."""
+        panel = Image.frombytes('1', (PANEL_WIDTH, PANEL_HEIGHT), bytes(self.ram[0x24]))
+        return panel.rotate(-90, expand=True)
+
+    def _save_frame(self, mode):
+        self.frames += 1
+        if not self.output_dir:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        img = self.image()
+        img.save(os.path.join(self.output_dir, f"{self.frames:05d}-{mode}.png"))
+        img.save(os.path.join(self.output_dir, 'latest.png'))
+        logger.debug(f"Simulated {mode} refresh, frame {self.frames}")
@@ -0,0 +1,33 @@
+import os
+import logging
+from functools import lru_cache
+from PIL import ImageFont
+from lib import metrics
+
+logger = logging.getLogger(__name__)
+
+# Dashboards use a handful of (font, size) pairs; keep a few spare for config edits
+FONT_CACHE_SIZE = 16
+
+metrics.describe('font_load_seconds', "Time spent loading fonts from disk (font cache misses)")
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load(path, size, layout_engine, mtime):
+    logger.debug(f"Loading font {path} at size {size}")
+    with metrics.timer('font_load_seconds'):
+        return ImageFont.truetype(path, size, layout_engine=layout_engine)
+
+def get_font(path, size, layout_engine=None):
+    """ImageFont.truetype() with a process-wide LRU cache.
+
+    The file's mtime is part of the cache key, so replacing a font on disk
+    loads the new one on the next render.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None  # not a file path; let truetype() search the system font dirs or fail
+    return _load(path, size, layout_engine, mtime)
+
+def clear_cache():
+    _load.cache_clear()
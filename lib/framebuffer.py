@@ -0,0 +1,42 @@
+from collections import namedtuple
+import numpy as np
+from lib import metrics
+
+metrics.describe('frame_pack_seconds', "Time spent packing drawn canvases into panel buffers")
+
+# A packed panel buffer as returned by a dashboard's render(). Partial frames are
+# shown with partial refreshes (and a full one every `full_refresh_every` frames),
+# the rest with a fast full refresh.
+Frame = namedtuple('Frame', ['buffer', 'partial', 'full_refresh_every'], defaults=(False, None))
+
+def pack(canvas, width, height, flip=False, invert=False):
+    """Pack a drawn canvas into the panel's byte buffer in one pass.
+
+    `canvas` is either panel-shaped (width x height, portrait) or landscape
+    (height x width), which is turned 90 degrees counter-clockwise like
+    `canvas.rotate(90, expand=True)`. `flip` turns the picture upside down and
+    `invert` swaps black and white. Rotations are NumPy views, so the only
+    full-frame copy is the bit-packing itself. Rows are MSB-first, padded
+    with zero bits to whole bytes, exactly as `EPD.getbuffer` returns them.
+    Canvases in other modes are dithered to 1-bit before rotating.
+    """
+    with metrics.timer('frame_pack_seconds'):
+        return _pack(canvas, width, height, flip, invert)
+
+def _pack(canvas, width, height, flip, invert):
+    if canvas.mode != '1':
+        canvas = canvas.convert('1')
+    pixels = np.asarray(canvas)
+    if canvas.size == (height, width):
+        pixels = np.rot90(pixels)
+    elif canvas.size != (width, height):
+        raise ValueError(f"Canvas is {canvas.size[0]}x{canvas.size[1]}, expected {width}x{height} or {height}x{width}")
+    if flip:
+        pixels = pixels[::-1, ::-1]
+
+    packed = np.packbits(pixels, axis=1)
+    if invert:
+        # Flip the pixel bits but leave the row padding zero
+        row_mask = np.packbits(np.ones(width, dtype=bool))
+        np.bitwise_xor(packed, row_mask, out=packed)
+    return packed.tobytes()
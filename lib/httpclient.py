@@ -0,0 +1,151 @@
+import time
+import logging
+import threading
+from collections import namedtuple, defaultdict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from lib import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10  # seconds, connect and read
+
+# Circuit breaker: after this many consecutive failures an endpoint is not
+# contacted for a cooldown. Then a single probe request goes out; the cooldown
+# doubles every time the probe fails. Failures of requests that were already
+# in flight when the circuit opened (e.g. the rest of a batch of stock quotes)
+# don't count.
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_COOLDOWN_SECONDS = 60
+CIRCUIT_MAX_COOLDOWN_SECONDS = 1800
+
+CacheEntry = namedtuple('CacheEntry', ['data', 'expires', 'etag', 'last_modified'])
+
+_session = None
+_cache = {}
+_lock = threading.Lock()
+
+# endpoint -> [consecutive failures, monotonic time the circuit stays open until, probe in flight]
+_circuits = defaultdict(lambda: [0, 0.0, False])
+
+# Per-endpoint results: hits (served from cache), misses (full fetch),
+# revalidated (304 Not Modified), errors and rejected (circuit open)
+metrics.describe('http_requests_total', "JSON requests by endpoint and result (hits, misses, revalidated, errors, rejected)")
+metrics.describe('http_fetch_seconds', "Time spent on network fetches by endpoint, failed ones included")
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of contacting an endpoint that keeps failing."""
+
+def _count(endpoint, field):
+    metrics.counter('http_requests_total', endpoint=endpoint, result=field).inc()
+
+def _check_circuit(endpoint):
+    """Raise CircuitOpenError if `endpoint` must not be contacted; True if this request is the probe."""
+    with _lock:
+        circuit = _circuits[endpoint]
+        failures, open_until, probing = circuit
+        remaining = open_until - time.monotonic()
+        half_open = failures >= CIRCUIT_FAILURE_THRESHOLD and remaining <= 0
+        if half_open and not probing:
+            circuit[2] = True
+            return True
+    if remaining > 0:
+        _count(endpoint, 'rejected')
+        raise CircuitOpenError(f"{endpoint} failed {failures} times in a row, retrying in {remaining:.0f}s")
+    if half_open:
+        _count(endpoint, 'rejected')
+        raise CircuitOpenError(f"{endpoint} failed {failures} times in a row, waiting for a probe request")
+    return False
+
+def _record_result(endpoint, ok, probe=False):
+    with _lock:
+        circuit = _circuits[endpoint]
+        if probe:
+            circuit[2] = False
+        if ok:
+            circuit[0] = 0
+            circuit[1] = 0.0
+            return
+        if circuit[1] > time.monotonic():
+            return  # started before the circuit opened; the failure is already counted
+        circuit[0] += 1
+        if circuit[0] >= CIRCUIT_FAILURE_THRESHOLD:
+            cooldown = min(CIRCUIT_MAX_COOLDOWN_SECONDS,
+                           CIRCUIT_COOLDOWN_SECONDS * 2 ** (circuit[0] - CIRCUIT_FAILURE_THRESHOLD))
+            circuit[1] = time.monotonic() + cooldown
+            logger.warning(f"{endpoint} failed {circuit[0]} times in a row, pausing requests for {cooldown}s")
+
+def get_session():
+    """Shared requests.Session, so connections (and TLS sessions) are reused between fetches."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+def set_session(session):
+    """Route all requests through `session` (anything with a requests-style get())."""
+    global _session
+    with _lock:
+        _session = session
+
+def _describe(url):
+    # Query strings carry API keys; keep them out of the logs
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+def get_json(url, ttl=0, timeout=DEFAULT_TIMEOUT, endpoint=None):
+    """GET a JSON document through the shared session.
+
+    Responses are reused for `ttl` seconds. After that, a cached response
+    carrying an ETag or Last-Modified header is revalidated with a
+    conditional request instead of being downloaded again. Endpoints that
+    keep failing raise CircuitOpenError without touching the network.
+    """
+    endpoint = endpoint or _describe(url)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(url)
+    if entry and now < entry.expires:
+        _count(endpoint, 'hits')
+        return entry.data
+
+    headers = {}
+    if entry:
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+    probe = _check_circuit(endpoint)
+    try:
+        with metrics.timer('http_fetch_seconds', endpoint=endpoint):
+            resp = get_session().get(url, headers=headers, timeout=timeout)
+            if resp.status_code == 304 and entry:
+                _count(endpoint, 'revalidated')
+                logger.debug(f"{_describe(url)} not modified")
+                data = entry.data
+            else:
+                resp.raise_for_status()
+                _count(endpoint, 'misses')
+                data = resp.json()
+    except Exception:
+        _count(endpoint, 'errors')
+        _record_result(endpoint, ok=False, probe=probe)
+        raise
+    _record_result(endpoint, ok=True, probe=probe)
+
+    etag = resp.headers.get('ETag') or (entry.etag if entry else None)
+    last_modified = resp.headers.get('Last-Modified') or (entry.last_modified if entry else None)
+    if ttl > 0 or etag or last_modified:
+        with _lock:
+            _cache[url] = CacheEntry(data, time.monotonic() + ttl, etag, last_modified)
+    return data
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
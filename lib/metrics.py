@@ -0,0 +1,146 @@
+import math
+import time
+import bisect
+import threading
+
+# Seconds; an e-paper refresh takes from a few hundred ms (partial) to a few seconds (full)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30)
+# Seconds; render stages (fonts, drawing, packing, SPI writes) take from under a ms to a few seconds
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_help = {}
+
+class Histogram:
+    """Cumulative bucket counts plus sum and count of observed values."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        with _lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """{'buckets': [(upper bound, cumulative count), ...], 'sum': ..., 'count': ...}"""
+        with _lock:
+            cumulative, total = [], 0
+            for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+                total += n
+                cumulative.append((bound, total))
+            return {'buckets': cumulative, 'sum': self.sum, 'count': self.count}
+
+class Counter:
+    """A value that only goes up: events, bytes, seconds spent."""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        with _lock:
+            self.value += amount
+
+class Timer:
+    """Context manager observing the seconds its block took into a histogram.
+
+    The elapsed time stays available as `seconds` afterwards, for logging.
+    Blocks that raise are timed too.
+    """
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.seconds = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        self.histogram.observe(self.seconds)
+        return False
+
+def _key(name, labels):
+    return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+def histogram(name, buckets=DEFAULT_BUCKETS, **labels):
+    """The histogram for `name` and `labels`, created on first use."""
+    key = _key(name, labels)
+    with _lock:
+        if key not in _histograms:
+            _histograms[key] = Histogram(buckets)
+        return _histograms[key]
+
+def counter(name, **labels):
+    """The counter for `name` and `labels`, created on first use."""
+    key = _key(name, labels)
+    with _lock:
+        if key not in _counters:
+            _counters[key] = Counter()
+        return _counters[key]
+
+def timer(name, buckets=STAGE_BUCKETS, **labels):
+    """`with timer('font_load_seconds'):` times the block into that histogram."""
+    return Timer(histogram(name, buckets, **labels))
+
+def describe(name, text):
+    """Set the HELP text shown for `name` on the metrics page."""
+    _help[name] = text
+
+def histograms():
+    """All histograms as {(name, ((label, value), ...)): Histogram}."""
+    with _lock:
+        return dict(_histograms)
+
+def counters():
+    """All counters as {(name, ((label, value), ...)): Counter}."""
+    with _lock:
+        return dict(_counters)
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    def escape(value):
+        return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels) + '}'
+
+def _header(lines, name, kind):
+    if name in _help:
+        lines.append(f"# HELP {name} {_help[name]}")
+    lines.append(f"# TYPE {name} {kind}")
+
+def render_prometheus():
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    last_name = None
+    for (name, labels), c in sorted(counters().items()):
+        if name != last_name:
+            _header(lines, name, 'counter')
+            last_name = name
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(c.value)}")
+
+    last_name = None
+    for (name, labels), h in sorted(histograms().items()):
+        if name != last_name:
+            _header(lines, name, 'histogram')
+            last_name = name
+        snap = h.snapshot()
+        for bound, count in snap['buckets']:
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(float(bound))),))} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(snap['sum'])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {snap['count']}")
+    return '\n'.join(lines) + '\n'
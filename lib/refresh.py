@@ -0,0 +1,39 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FULL_REFRESH_EVERY = 15
+
+class RefreshScheduler:
+    """Decides between a full base-image refresh and a partial update.
+
+    The first frame after start-up or a dashboard switch is written as a base
+    image (both RAM banks, full waveform). Following frames go out as partial
+    updates until `full_refresh_every` of them have been shown, at which point
+    the next frame is a full refresh again to clear ghosting.
+    """
+
+    def __init__(self, full_refresh_every=DEFAULT_FULL_REFRESH_EVERY):
+        self.full_refresh_every = full_refresh_every
+        self._partials_since_full = None  # None: no base image on the panel
+
+    def reset(self):
+        """Make the next push a full refresh."""
+        self._partials_since_full = None
+
+    def push(self, epd, buf, full_refresh_every=None):
+        if full_refresh_every is not None:
+            self.full_refresh_every = full_refresh_every
+
+        if self._partials_since_full is None or self._partials_since_full >= self.full_refresh_every:
+            # An unchanged frame is skipped by the driver; try the base image again next time
+            if epd.displayPartBaseImage(buf):
+                logger.debug("Full refresh with new base image")
+                self._partials_since_full = 0
+        elif epd.displayPartial(buf):
+            self._partials_since_full += 1
+            logger.debug(f"Partial refresh {self._partials_since_full}/{self.full_refresh_every}")
+
+# Shared by the render loop (which resets it on dashboard switches) and the
+# dashboards that opt in to partial updates.
+scheduler = RefreshScheduler()
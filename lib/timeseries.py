@@ -0,0 +1,109 @@
+import os
+import csv
+import logging
+import threading
+from datetime import datetime
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File layout: 8-byte header, then fixed-width little-endian records of
+# (epoch seconds, value), sorted by time. Because every record has the same
+# size, record i lives at HEADER_SIZE + i * RECORD_SIZE and a time window is
+# found by binary search over the mapped file instead of reading all of it.
+MAGIC = b'EDTS\x01\x00\x00\x00'
+HEADER_SIZE = len(MAGIC)
+RECORD = np.dtype([('t', '<i8'), ('v', '<i8')])
+RECORD_SIZE = RECORD.itemsize
+
+class TimeSeries:
+    """Append-only store of integer samples, queried by time range."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _records(self):
+        """Memory-map the complete records, or None if there are none yet."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return None
+        count = (size - HEADER_SIZE) // RECORD_SIZE
+        if count <= 0:
+            return None
+        with open(self.path, 'rb') as f:
+            if f.read(HEADER_SIZE) != MAGIC:
+                raise ValueError(f"{self.path} is not a time-series file")
+        return np.memmap(self.path, dtype=RECORD, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+    def __len__(self):
+        records = self._records()
+        return 0 if records is None else len(records)
+
+    def last(self):
+        """Newest (timestamp, value), or None when empty."""
+        records = self._records()
+        if records is None:
+            return None
+        return int(records['t'][-1]), int(records['v'][-1])
+
+    def append(self, timestamp, value):
+        self.extend([(timestamp, value)])
+
+    def extend(self, samples):
+        """Append (epoch seconds, value) pairs; samples older than the newest stored one are dropped."""
+        with self._lock:
+            last = self.last()
+            last_t = last[0] if last else None
+            rows = []
+            for t, v in samples:
+                t = int(t)
+                if last_t is not None and t < last_t:
+                    logger.warning(f"Dropping out-of-order sample at {datetime.fromtimestamp(t)} for {self.path}")
+                    continue
+                rows.append((t, int(v)))
+                last_t = t
+            if not rows:
+                return
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'ab') as f:
+                size = f.tell()
+                if size == 0:
+                    f.write(MAGIC)
+                elif (size - HEADER_SIZE) % RECORD_SIZE:
+                    # An interrupted write left a partial record; drop it
+                    f.truncate(size - (size - HEADER_SIZE) % RECORD_SIZE)
+                f.write(np.array(rows, dtype=RECORD).tobytes())
+
+    def range(self, start=None, end=None):
+        """Samples with start <= t <= end as (timestamps, values) int64 arrays.
+
+        Only the pages holding the window (plus a binary search) are read, so
+        the cost depends on the size of the window, not of the history.
+        """
+        records = self._records()
+        if records is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        times = records['t']
+        lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        hi = len(records) if end is None else int(np.searchsorted(times, end, side='right'))
+        window = np.array(records[lo:hi])
+        return window['t'], window['v']
+
+def import_csv(csv_path, series, time_column='timestamp', value_column='subscribers'):
+    """Copy the rows of a CSV with ISO timestamps into `series`; returns the number imported."""
+    samples = []
+    with open(csv_path, newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                samples.append((datetime.fromisoformat(row[time_column]).timestamp(), int(row[value_column])))
+            except (KeyError, TypeError, ValueError):
+                logger.debug(f"Skipping malformed row in {csv_path}: {row}")
+    samples.sort()
+    series.extend(samples)
+    logger.info(f"Imported {len(samples)} samples from {csv_path} into {series.path}")
+    return len(samples)
@@ -1,33 +1,53 @@
-import os
 import time
-import yaml
 import logging
 import sys
 import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-from display import show_dashboard
+from display import show_dashboard, prerender_dashboard, DisplayWorker, DEFAULT_PRERENDER_SECONDS
+from config_service import ConfigService, thaw
+import events
+import providers
 import lib.epd2in13b_V4 as epd2in13b_V4
 import web  # assumes web.py defines Flask app as `app`
 
 CONFIG_PATH = 'config.yaml'
-FLAG_PATH = '.refresh_dashboard.flag'
+# Put the panel into deep sleep when the next refresh is at least this many seconds away
+DEFAULT_SLEEP_THRESHOLD_SECONDS = 20
 
-def load_config():
-    with open(CONFIG_PATH, 'r') as f:
-        return yaml.safe_load(f)
-
-def setup_logging(config):
+def get_log_level(config):
     level_str = config.get('logging', {}).get('level', 'INFO').upper()
-    level = getattr(logging, level_str, logging.INFO)
-    logging.basicConfig(level=level, format='%(asctime)s [%(levelname)s] %(message)s')
+    return getattr(logging, level_str, logging.INFO)
 
-def check_and_clear_flag():
-    if os.path.exists(FLAG_PATH):
-        os.remove(FLAG_PATH)
-        logging.debug("Refresh flag detected and cleared")
-        return True
-    return False
+def setup_logging(config):
+    logging.basicConfig(level=get_log_level(config), format='%(asctime)s [%(levelname)s] %(message)s')
+
+def apply_log_level(config):
+    logging.getLogger().setLevel(get_log_level(config))
+
+def apply_display_settings(epd, config):
+    display_config = config.get('display', {})
+    epd.busy_timeout = display_config.get('busy_timeout_seconds', epd2in13b_V4.BUSY_TIMEOUT_SECONDS)
+
+def handle_commands(commands, configs):
+    """Apply commands from the web UI; returns True if the current dashboard must be redrawn."""
+    if not commands:
+        return False
+    # The web UI has written config.yaml already; don't wait for the file watcher
+    configs.check()
+    current = configs.get().get('current_dashboard', 'clock')
+    force_refresh = False
+    for command in commands:
+        logging.debug(f"Received command: {command.kind} {command.arg or ''}")
+        if command.kind == events.SWITCH_DASHBOARD:
+            force_refresh = True
+        elif command.kind == events.RELOAD_SECTION:
+            if command.arg in (None, current, 'flip_screen'):
+                force_refresh = True
+        elif command.kind == events.FORCE_REFRESH:
+            force_refresh = True
+    return force_refresh
 
 def start_web_gui():
     web.app.run(host='0.0.0.0', port=8080, debug=False, use_reloader=False)
@@ -37,6 +57,17 @@ def get_refresh_interval(dashboard_name, config):
         return None
     return config.get(dashboard_name, {}).get('refresh_interval_seconds', 60)
 
+def seconds_until_next_refresh(dashboard_name, config, last_rendered, next_cycle_time=None):
+    """How long until the render loop will next draw something, as far as the schedule knows."""
+    now = time.time()
+    if dashboard_name == 'clock':
+        seconds = 60 - now % 60
+    else:
+        seconds = last_rendered + get_refresh_interval(dashboard_name, config) - now
+    if next_cycle_time is not None:
+        seconds = min(seconds, next_cycle_time - now)
+    return max(0, seconds)
+
 def get_enabled_dashboards(config):
     """Get list of dashboards enabled for cycling"""
     cycle_config = config.get('cycle', {})
@@ -57,12 +88,31 @@ def get_next_dashboard(current_dashboard, enabled_dashboards):
         return enabled_dashboards[0] if enabled_dashboards else current_dashboard
 
 def main():
-    config = load_config()
+    configs = ConfigService(CONFIG_PATH)
+    config = configs.get()
     setup_logging(config)
+    configs.subscribe(apply_log_level)
+    configs.start()
 
+    # Weather, stocks and YouTube data refresh in the background from here on
+    providers.sync(config)
+    configs.subscribe(providers.sync)
+
+    epd2in13b_V4.use_backend(config.get('display', {}).get('backend'))
     epd = epd2in13b_V4.EPD()
+    apply_display_settings(epd, config)
+    configs.subscribe(lambda config: apply_display_settings(epd, config))
     epd.init_fast()
 
+    # Only the display worker talks to the panel from here on
+    worker = DisplayWorker(epd)
+    worker.start()
+
+    try:
+        events.channel.serve_socket()
+    except OSError as e:
+        logging.warning(f"Command socket unavailable, only the in-process web UI can reach the render loop: {e}")
+
     gui_thread = threading.Thread(target=start_web_gui, daemon=True)
     gui_thread.start()
 
@@ -70,10 +120,15 @@ def main():
     last_minute = None
     last_rendered = 0
     last_cycle_time = time.time()
+    commands = []
+    prerender_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prerender')
+    prerender_future = None
+    prerender_switch_time = None  # the switch prerender_future was drawn for
 
     try:
         while True:
-            config = load_config()
+            force_refresh = handle_commands(commands, configs)
+            config = configs.get()
             current = config.get('current_dashboard', 'clock')
             
             # Check for cycling
@@ -82,22 +137,46 @@ def main():
             cycle_interval_minutes = cycle_config.get('interval_minutes', 5)
             flip_screen = config.get('flip_screen', False)
             
+            prerender_seconds = cycle_config.get('prerender_seconds', DEFAULT_PRERENDER_SECONDS)
+            
             now = time.time()
-            force_refresh = check_and_clear_flag()
+            next_cycle_time = last_cycle_time + cycle_interval_minutes * 60
+
+            # A pre-render is only good for the switch it was started for
+            if prerender_future is not None and (not cycle_enabled or next_cycle_time != prerender_switch_time):
+                logging.debug("Cycle schedule changed; dropping the pre-rendered frame")
+                prerender_future.cancel()
+                prerender_future = None
+
+            # Draw the upcoming dashboard ahead of time so the switch is just a panel refresh
+            if cycle_enabled and prerender_future is None and now >= next_cycle_time - prerender_seconds:
+                upcoming = get_next_dashboard(current, get_enabled_dashboards(config))
+                if upcoming != current:
+                    prerender_future = prerender_executor.submit(
+                        prerender_dashboard, upcoming, epd, config, flip_screen=flip_screen)
+                    prerender_switch_time = next_cycle_time
             
             # Handle automatic cycling
-            if cycle_enabled and (now - last_cycle_time >= cycle_interval_minutes * 60):
+            prerendered = None
+            if cycle_enabled and now >= next_cycle_time:
                 enabled_dashboards = get_enabled_dashboards(config)
                 if enabled_dashboards:
                     next_dashboard = get_next_dashboard(current, enabled_dashboards)
                     if next_dashboard != current:
-                        config['current_dashboard'] = next_dashboard
                         # Save the updated config
-                        with open(CONFIG_PATH, 'w') as f:
-                            yaml.dump(config, f)
+                        new_config = thaw(config)
+                        new_config['current_dashboard'] = next_dashboard
+                        configs.save(new_config)
+                        config = configs.get()
                         current = next_dashboard
                         logging.info(f"Cycled to dashboard: {current}")
+                        if prerender_future is not None:
+                            try:
+                                prerendered = prerender_future.result()
+                            except Exception as e:
+                                logging.warning(f"Pre-rendering {current} failed: {e}")
                 last_cycle_time = now
+                prerender_future = None
 
             logging.debug(f"Selected dashboard: {current}")
 
@@ -118,18 +197,32 @@ def main():
 
             if should_render:
                 try:
-                    show_dashboard(current, epd, config, flip_screen=flip_screen)
-                    logging.info(f"Rendered dashboard: {current}")
+                    if show_dashboard(current, worker, config, flip_screen=flip_screen, prerendered=prerendered):
+                        logging.info(f"Rendered dashboard: {current}")
                     last_rendered = now
                     last_dashboard = current
                 except Exception as e:
                     logging.exception(f"Failed to render dashboard '{current}': {e}")
 
-            # Wait short time to keep loop responsive
-            time.sleep(1)
+            # Power the panel down between refreshes; the next frame wakes it
+            display_config = config.get('display', {})
+            if display_config.get('deep_sleep', True):
+                next_switch = last_cycle_time + cycle_interval_minutes * 60 if cycle_enabled else None
+                idle_seconds = seconds_until_next_refresh(current, config, last_rendered, next_switch)
+                if idle_seconds >= display_config.get('sleep_threshold_seconds', DEFAULT_SLEEP_THRESHOLD_SECONDS):
+                    worker.sleep_when_idle()
+
+            # Wait short time to keep loop responsive; commands from the web UI wake us immediately
+            timeout = 1
+            if cycle_enabled:
+                # wake exactly when the next switch is due
+                timeout = min(timeout, max(0, last_cycle_time + cycle_interval_minutes * 60 - time.time()))
+            commands = events.channel.wait(timeout=timeout)
 
     except KeyboardInterrupt:
         logging.info("Interrupted by user. Cleaning up.")
+        # Let a refresh in progress finish before the bus goes away
+        worker.wait_idle(timeout=epd.busy_timeout)
         epd2in13b_V4.epdconfig.module_exit(cleanup=True)
         sys.exit(0)
 
@@ -0,0 +1,226 @@
+import os
+import time
+import json
+import logging
+import importlib
+import threading
+from collections import namedtuple
+
+from config_service import freeze, thaw
+from lib import metrics
+
+logger = logging.getLogger(__name__)
+
+# How long a dashboard waits for a provider's first snapshot (or one matching new settings)
+SNAPSHOT_WAIT_SECONDS = 15
+
+# Last successful payload of each provider, served after restarts and during outages
+LAST_GOOD_DIR = 'data/last_good'
+# Failed refreshes back off exponentially, up to this delay (or the refresh interval if longer)
+MAX_BACKOFF_SECONDS = 1800
+
+metrics.describe('provider_refresh_seconds', "Time a provider took to fetch and publish new data, failed refreshes included")
+metrics.describe('provider_refresh_failures_total', "Provider refreshes that raised")
+metrics.describe('provider_wait_seconds', "Time dashboards spent waiting for provider data while rendering")
+
+# data: frozen payload, fetched_at: epoch seconds, params: settings it was fetched with
+Snapshot = namedtuple('Snapshot', ['data', 'fetched_at', 'params'])
+
+class Provider:
+    """Fetches one data source on its own schedule in a background thread.
+
+    Subclasses implement params(config), the hashable subset of the config the
+    fetch depends on, and fetch(config), which returns the payload. Dashboards
+    read the latest published Snapshot and never wait on the network
+    themselves, except for the very first fetch. The last good snapshot is
+    kept on disk, so it is served straight away after a restart or while
+    the upstream is unreachable.
+    """
+
+    name = None
+    default_interval = 60
+
+    def __init__(self):
+        self._config = None
+        self._published = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+        self.active = False
+        self.failures = 0
+        self._gave_up_on = None  # params a wait_for_snapshot() already timed out on
+        self._snapshot = self._load_last_good()
+
+    def params(self, config):
+        raise NotImplementedError
+
+    def fetch(self, config):
+        raise NotImplementedError
+
+    def interval(self, config):
+        return config.get(self.name, {}).get('refresh_interval_seconds', self.default_interval)
+
+    def configure(self, config):
+        """Use `config` from now on; refetch right away if the relevant settings changed."""
+        old_config, self._config = self._config, config
+        if old_config is None or self.params(old_config) != self.params(config):
+            self._wake.set()
+
+    def start(self):
+        self.active = True
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"provider-{self.name}", daemon=True)
+            self._thread.start()
+            logger.debug(f"Started {self.name} provider")
+
+    def stop(self):
+        if self.active:
+            logger.debug(f"Stopping {self.name} provider")
+        self.active = False
+        self._wake.set()
+
+    def snapshot(self):
+        return self._snapshot
+
+    def wait_for_snapshot(self, params, timeout):
+        """Snapshot fetched with `params`, waiting up to `timeout` for it; None if there is none.
+
+        A snapshot fetched with other settings (another location, other units)
+        is never returned. Once a wait for `params` has timed out, later calls
+        don't wait again until a fetch with those settings succeeds.
+        """
+        with self._published:
+            if params == self._gave_up_on:
+                timeout = 0
+            deadline = time.monotonic() + timeout
+            while self._snapshot is None or self._snapshot.params != params:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._gave_up_on = params
+                    return None
+                self._published.wait(remaining)
+            return self._snapshot
+
+    def publish(self, data, params):
+        with self._published:
+            previous = self._snapshot
+            self._snapshot = Snapshot(freeze(data), time.time(), params)
+            self._published.notify_all()
+        # Cached upstream responses repeat; only touch the SD card when the payload changes
+        if previous is None or previous.data != self._snapshot.data or previous.params != params:
+            self._save_last_good(self._snapshot)
+
+    def _last_good_path(self):
+        return os.path.join(LAST_GOOD_DIR, f"{self.name}.json")
+
+    def _load_last_good(self):
+        try:
+            with open(self._last_good_path()) as f:
+                saved = json.load(f)
+            snapshot = Snapshot(freeze(saved['data']), saved['fetched_at'], freeze(saved['params']))
+            logger.debug(f"Loaded last good {self.name} data from {time.ctime(snapshot.fetched_at)}")
+            return snapshot
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable last good {self.name} data: {e}")
+            return None
+
+    def _save_last_good(self, snapshot):
+        path = self._last_good_path()
+        try:
+            os.makedirs(LAST_GOOD_DIR, exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'fetched_at': snapshot.fetched_at, 'params': thaw(snapshot.params),
+                           'data': thaw(snapshot.data)}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not save last good {self.name} data: {e}")
+
+    def retry_delay(self, config):
+        """Seconds until the next refresh: the interval, stretched exponentially after failures."""
+        interval = self.interval(config)
+        if self.failures == 0:
+            return interval
+        return min(interval * 2 ** (self.failures - 1), max(interval, MAX_BACKOFF_SECONDS))
+
+    def refresh(self):
+        config = self._config
+        params = self.params(config)
+        with metrics.timer('provider_refresh_seconds', provider=self.name) as timer:
+            data = self.fetch(config)
+            self.publish(data, params)
+        logger.debug(f"{self.name} provider refreshed in {timer.seconds:.2f}s")
+
+    def _run(self):
+        while self.active:
+            self._wake.clear()
+            try:
+                self.refresh()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                metrics.counter('provider_refresh_failures_total', provider=self.name).inc()
+                logger.warning(f"{self.name} provider refresh failed ({self.failures} in a row), "
+                               f"retrying in {self.retry_delay(self._config)}s: {e}")
+            self._wake.wait(self.retry_delay(self._config))
+
+# Provider classes by dashboard name, imported on first use
+PROVIDER_CLASSES = {
+    'weather': 'providers.weather.WeatherProvider',
+    'stocks': 'providers.stocks.StocksProvider',
+    'youtube': 'providers.youtube.YoutubeProvider',
+}
+
+_providers = {}
+_lock = threading.Lock()
+
+def get(name):
+    with _lock:
+        if name not in _providers:
+            module_name, class_name = PROVIDER_CLASSES[name].rsplit('.', 1)
+            _providers[name] = getattr(importlib.import_module(module_name), class_name)()
+        return _providers[name]
+
+def wanted_providers(config):
+    """Providers needed by the current dashboard and any dashboard in the cycle."""
+    names = {config.get('current_dashboard', 'clock')}
+    cycle_config = config.get('cycle', {})
+    if cycle_config.get('enabled', False):
+        names.update(name for name, enabled in cycle_config.get('dashboards', {}).items() if enabled)
+    return names & set(PROVIDER_CLASSES)
+
+def sync(config):
+    """Run exactly the providers the config needs, with the latest settings."""
+    wanted = wanted_providers(config)
+    for name in wanted:
+        provider = get(name)
+        provider.configure(config)
+        provider.start()
+    with _lock:
+        running = [provider for name, provider in _providers.items() if name not in wanted]
+    for provider in running:
+        provider.stop()
+
+def age_label(name, snapshot, config):
+    """Short "3h old" style label once a snapshot is older than two refresh intervals, else None."""
+    age = time.time() - snapshot.fetched_at
+    if age < 2 * get(name).interval(config):
+        return None
+    if age < 3600:
+        return f"{int(age // 60)}m old"
+    if age < 86400:
+        return f"{int(age // 3600)}h old"
+    return f"{int(age // 86400)}d old"
+
+def latest(name, config, timeout=SNAPSHOT_WAIT_SECONDS):
+    """Latest snapshot for a dashboard's current settings; raises if there is none (yet)."""
+    provider = get(name)
+    provider.configure(config)
+    if not provider.active:
+        provider.start()
+    with metrics.timer('provider_wait_seconds', provider=name):
+        snapshot = provider.wait_for_snapshot(provider.params(config), timeout)
+    if snapshot is None:
+        raise RuntimeError(f"No {name} data for the current settings yet")
+    return snapshot
@@ -0,0 +1,79 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+from lib import httpclient
+from providers import Provider
+
+logger = logging.getLogger(__name__)
+
+# Finnhub quotes move every few seconds during market hours; don't ask more often than this
+QUOTE_CACHE_SECONDS = 15
+# Time budget for all quotes of one render; slow symbols fall back to their last known value
+FETCH_DEADLINE_SECONDS = 8
+MAX_SYMBOLS = 8
+
+_executor = ThreadPoolExecutor(max_workers=MAX_SYMBOLS, thread_name_prefix="stocks")
+_last_quotes = {}     # symbol -> (price, change_pct) from the last successful fetch
+quote_latency = {}    # symbol -> seconds taken by the last fetch attempt
+
+def fetch_quote(sym, api_key, cache_seconds, timeout):
+    start = time.monotonic()
+    try:
+        url = f"https://finnhub.io/api/v1/quote?symbol={sym}&token={api_key}"
+        data = httpclient.get_json(url, ttl=cache_seconds, timeout=timeout, endpoint="finnhub")
+    finally:
+        quote_latency[sym] = time.monotonic() - start
+    price = data.get('c')
+    prev = data.get('pc')
+    if price and prev:
+        return price, ((price - prev) / prev) * 100
+    return None
+
+def fetch_quotes(symbols, api_key, cache_seconds, deadline=FETCH_DEADLINE_SECONDS):
+    """Fetch all symbols concurrently; returns [(sym, price, change_pct)] in symbol order."""
+    futures = {sym: _executor.submit(fetch_quote, sym, api_key, cache_seconds, deadline) for sym in symbols}
+    done, _ = wait(futures.values(), timeout=deadline)
+
+    results = []
+    fresh = 0
+    for sym, future in futures.items():
+        quote = None
+        if future in done:
+            try:
+                quote = future.result()
+            except Exception as e:
+                logger.warning(f"Failed to fetch {sym}: {e}")
+        else:
+            logger.warning(f"Quote for {sym} missed the {deadline}s deadline")
+
+        if quote:
+            _last_quotes[sym] = quote
+            fresh += 1
+        elif sym in _last_quotes:
+            quote = _last_quotes[sym]
+            logger.debug(f"Using last known quote for {sym}")
+        if quote:
+            results.append((sym, *quote))
+
+    logger.debug("Quote latency: " + ", ".join(f"{sym}={quote_latency.get(sym, 0):.2f}s" for sym in symbols))
+    if symbols and not fresh:
+        # Nothing new; fail so the provider keeps its last good snapshot and backs off
+        raise RuntimeError(f"No quotes fetched for {', '.join(symbols)}")
+    return results
+
+class StocksProvider(Provider):
+    name = 'stocks'
+
+    def params(self, config):
+        cfg = config.get('stocks', {})
+        return tuple(cfg.get('symbols', [])[:MAX_SYMBOLS])
+
+    def fetch(self, config):
+        cfg = config.get('stocks', {})
+        load_dotenv()
+        api_key = os.getenv("FINNHUB_API_KEY")
+        return fetch_quotes(self.params(config), api_key,
+                            cfg.get('cache_seconds', QUOTE_CACHE_SECONDS),
+                            cfg.get('fetch_deadline_seconds', FETCH_DEADLINE_SECONDS))
@@ -0,0 +1,90 @@
+import os
+import json
+import logging
+from lib import httpclient, metrics
+from providers import Provider
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_CACHE_PATH = "data/geocode_cache.json"
+# Open-Meteo recomputes its forecast every 15 minutes at most
+FORECAST_CACHE_SECONDS = 300
+
+_geocode_cache = None
+
+metrics.describe('geocode_seconds', "Time spent geocoding postal codes with Nominatim (cache misses)")
+
+def load_geocode_cache():
+    global _geocode_cache
+    if _geocode_cache is None:
+        try:
+            with open(GEOCODE_CACHE_PATH) as f:
+                _geocode_cache = json.load(f)
+        except FileNotFoundError:
+            _geocode_cache = {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable geocode cache {GEOCODE_CACHE_PATH}: {e}")
+            _geocode_cache = {}
+    return _geocode_cache
+
+def save_geocode_cache(cache):
+    os.makedirs(os.path.dirname(GEOCODE_CACHE_PATH), exist_ok=True)
+    tmp_path = GEOCODE_CACHE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, GEOCODE_CACHE_PATH)
+
+def zip_to_latlon(zip_code, country="USA"):
+    # A postal code's coordinates never change, so only ever ask Nominatim once
+    cache = load_geocode_cache()
+    key = f"{country}:{zip_code}"
+    if key in cache:
+        lat, lon = cache[key]
+        return lat, lon
+
+    try:
+        from geopy.geocoders import Nominatim  # only needed the first time a postal code is seen
+        geolocator = Nominatim(user_agent="eink-weather")
+        with metrics.timer('geocode_seconds'):
+            location = geolocator.geocode({"postalcode": zip_code, "country": country})
+        if not location:
+            raise ValueError(f"No lat/lon found for ZIP {zip_code}")
+    except Exception as e:
+        logger.exception(f"ZIP to lat/lon failed for {zip_code}")
+        raise
+
+    cache[key] = [location.latitude, location.longitude]
+    try:
+        save_geocode_cache(cache)
+    except OSError as e:
+        logger.warning(f"Could not save geocode cache: {e}")
+    logger.info(f"Geocoded {key} to {location.latitude}, {location.longitude}")
+    return location.latitude, location.longitude
+
+def fetch_weather(lat, lon, forecast_mode, use_celsius, cache_seconds=FORECAST_CACHE_SECONDS):
+    units = "celsius" if use_celsius else "fahrenheit"
+    base_url = (
+        f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
+        f"&current_weather=true&timezone=auto"
+        f"&daily=sunrise,sunset,temperature_2m_max,temperature_2m_min,weathercode"
+        f"&hourly=temperature_2m,apparent_temperature,weathercode,relative_humidity_2m"
+        f"&temperature_unit={units}"
+    )
+    return httpclient.get_json(base_url, ttl=cache_seconds, endpoint="open-meteo")
+
+class WeatherProvider(Provider):
+    name = 'weather'
+
+    def params(self, config):
+        cfg = config.get('weather', {})
+        return (cfg.get('location', '84101'), cfg.get('country', 'USA'),
+                cfg.get('latitude'), cfg.get('longitude'),
+                cfg.get('units', 'C'), cfg.get('forecast_mode', 'hourly'))
+
+    def fetch(self, config):
+        cfg = config.get('weather', {})
+        zip_code, country, lat, lon, units, forecast_mode = self.params(config)
+        if lat is None or lon is None:
+            lat, lon = zip_to_latlon(zip_code, country)
+        return fetch_weather(lat, lon, forecast_mode, units == 'C',
+                             cfg.get('cache_seconds', FORECAST_CACHE_SECONDS))
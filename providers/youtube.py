@@ -0,0 +1,61 @@
+import os
+import time
+import logging
+from dotenv import load_dotenv
+from lib import httpclient
+from lib.timeseries import TimeSeries, import_csv
+from providers import Provider
+
+logger = logging.getLogger(__name__)
+
+# Subscriber counts are rounded and updated slowly by YouTube
+CHANNEL_CACHE_SECONDS = 300
+SUBSCRIBERS_PATH = "data/subscribers.ts"
+# History was kept as CSV before; it is imported once into the time-series store
+SUBSCRIBERS_CSV_PATH = "data/subscribers.csv"
+
+history = TimeSeries(SUBSCRIBERS_PATH)
+
+def fetch_subscribers(api_key, channel_id, cache_seconds=CHANNEL_CACHE_SECONDS):
+    url = (
+        "https://www.googleapis.com/youtube/v3/channels"
+        f"?part=snippet,statistics&id={channel_id}&key={api_key}"
+    )
+    data = httpclient.get_json(url, ttl=cache_seconds, endpoint="youtube")
+    item = data['items'][0]
+    return int(item['statistics']['subscriberCount'])
+
+def import_legacy_history(csv_path=SUBSCRIBERS_CSV_PATH):
+    if len(history) == 0 and os.path.exists(csv_path):
+        try:
+            import_csv(csv_path, history)
+        except Exception as e:
+            logger.warning(f"Could not import subscriber history from {csv_path}: {e}")
+
+def record_subscribers(sub_count):
+    history.append(time.time(), sub_count)
+
+class YoutubeProvider(Provider):
+    name = 'youtube'
+    default_interval = 600
+
+    def __init__(self):
+        super().__init__()
+        import_legacy_history()
+
+    def params(self, config):
+        # The channel comes from .env, not config.yaml
+        return ()
+
+    def fetch(self, config):
+        cfg = config.get('youtube', {})
+        load_dotenv()
+        api_key = os.getenv("YOUTUBE_API_KEY")
+        channel_id = os.getenv("YOUTUBE_CHANNEL_ID")
+        if not api_key or not channel_id:
+            raise RuntimeError("Missing YOUTUBE_API_KEY or YOUTUBE_CHANNEL_ID in .env")
+
+        sub_count = fetch_subscribers(api_key, channel_id, cfg.get('cache_seconds', CHANNEL_CACHE_SECONDS))
+        logger.debug(f"Subscribers: {sub_count}")
+        record_subscribers(sub_count)
+        return {'subscribers': sub_count}
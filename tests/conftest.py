@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The tests run without a panel or network: the EPD driver talks to the simulated panel
+os.environ.setdefault('EPD_BACKEND', 'simulated')
+os.environ.setdefault('EPD_SIM_TIME_SCALE', '0')
+os.environ.setdefault('EPD_SIM_OUTPUT', '')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+from PIL import Image
+
+from lib import assets
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, 'CACHE_DIR', str(tmp_path / 'cache'))
+    assets.clear_cache()
+    yield tmp_path / 'cache'
+    assets.clear_cache()
+
+def make_images(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"image{i}.png"
+        Image.effect_noise((64, 64), 64 + i).save(path)
+        paths.append(str(path))
+    return paths
+
+def test_cache_dir_is_pruned_to_its_size_limit(tmp_path, cache_dir, monkeypatch):
+    paths = make_images(tmp_path, 10)
+    assets.load_1bit(paths[0])
+    file_size = sum(f.stat().st_size for f in cache_dir.iterdir())
+    monkeypatch.setattr(assets, 'CACHE_DIR_BYTES', 3 * file_size)
+
+    for path in paths[1:]:
+        assets.load_1bit(path)
+
+    assert sum(f.stat().st_size for f in cache_dir.iterdir()) <= 3 * file_size
+    assert len(os.listdir(cache_dir)) >= 2
+
+def test_pruning_keeps_recently_used_files(tmp_path, cache_dir):
+    paths = make_images(tmp_path, 3)
+    cached = []
+    for age, path in enumerate(paths):
+        before = set(cache_dir.iterdir()) if cache_dir.exists() else set()
+        assets.load_1bit(path)
+        (new_file,) = set(cache_dir.iterdir()) - before
+        os.utime(new_file, ns=(0, age * 10**9))  # oldest first
+        cached.append(new_file)
+
+    # Served from disk again: the oldest file becomes the most recently used
+    assets.clear_cache()
+    assets.load_1bit(paths[0])
+    assets.prune_cache_dir(max_bytes=sum(f.stat().st_size for f in cached[::2]))
+
+    assert cached[0].exists()
+    assert not cached[1].exists()
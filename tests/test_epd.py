@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+import lib.epd2in13b_V4 as epd2in13b_V4
+
+BUFFER_BYTES = (epd2in13b_V4.EPD_WIDTH + 7) // 8 * epd2in13b_V4.EPD_HEIGHT
+
+@pytest.fixture
+def panel():
+    epd2in13b_V4.use_backend('simulated')
+    return epd2in13b_V4.epdconfig
+
+@pytest.fixture
+def epd(panel):
+    epd = epd2in13b_V4.EPD()
+    epd.init_fast()
+    return epd
+
+def frames(count):
+    return [os.urandom(BUFFER_BYTES) for _ in range(count)]
+
+def test_base_image_after_partials_reinitializes(epd, panel):
+    base, *partials, next_base = frames(5)
+    epd.displayPartBaseImage(base)
+    for buf in partials:
+        epd.displayPartial(buf)
+    swresets = panel.refreshes['reset']
+
+    epd.displayPartBaseImage(next_base)
+
+    assert panel.refreshes['reset'] == swresets + 1
+    assert bytes(panel.ram[0x24]) == next_base
+    assert bytes(panel.ram[0x26]) == next_base
+
+def test_base_image_after_busy_timeout_reinitializes(epd, panel, monkeypatch):
+    stuck, base = frames(2)
+    monkeypatch.setattr(panel, 'wait_busy_release', lambda timeout: False)
+    with pytest.raises(epd2in13b_V4.EPDBusyTimeout):
+        epd.display_fast(stuck)
+    monkeypatch.undo()
+    swresets = panel.refreshes['reset']
+
+    assert epd.displayPartBaseImage(base)
+
+    assert panel.refreshes['reset'] == swresets + 1
+    assert bytes(panel.ram[0x24]) == base
+
+def test_partial_after_deep_sleep_uses_full_reset(epd, panel, monkeypatch):
+    base, partial = frames(2)
+    epd.displayPartBaseImage(base)
+    epd.deep_sleep()
+    delays = []
+    monkeypatch.setattr(panel, 'delay_ms', delays.append)
+
+    assert epd.displayPartial(partial)
+
+    assert not epd.asleep and not panel.asleep
+    assert 20 in delays  # reset() settle time, not just the short RST pulse
+    assert bytes(panel.ram[0x24]) == partial
+
+def test_init_after_sleep_writes_the_whole_frame(epd, panel):
+    first, = frames(1)
+    # one changed byte: a diff against a stale RAM shadow would write only that
+    second = first[:100] + bytes([first[100] ^ 0xFF]) + first[101:]
+    epd.display_fast(first)
+    epd.sleep()
+    # power was cut: the controller RAM is gone
+    panel.ram[0x24][:] = b'\xff' * BUFFER_BYTES
+
+    epd.init_fast()
+    assert epd.display_fast(second)
+
+    assert bytes(panel.ram[0x24]) == second
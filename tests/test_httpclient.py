@@ -0,0 +1,54 @@
+import time
+import threading
+
+import pytest
+import requests
+
+from lib import httpclient
+from providers import stocks
+
+class FailingSession:
+    """Times out every request, but only once `concurrent` of them are in flight."""
+
+    def __init__(self, concurrent):
+        self.barrier = threading.Barrier(concurrent, timeout=5)
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        self.barrier.wait()
+        raise requests.Timeout("simulated timeout")
+
+@pytest.fixture(autouse=True)
+def clean_client():
+    httpclient.clear_cache()
+    httpclient._circuits.clear()
+    stocks._last_quotes.clear()
+    yield
+    httpclient.set_session(None)
+    httpclient._circuits.clear()
+
+def cooldown(endpoint):
+    return httpclient._circuits[endpoint][1] - time.monotonic()
+
+def test_failed_quote_batch_opens_circuit_for_base_cooldown():
+    symbols = tuple(f"SYM{i}" for i in range(stocks.MAX_SYMBOLS))
+    httpclient.set_session(FailingSession(len(symbols)))
+
+    with pytest.raises(RuntimeError):
+        stocks.fetch_quotes(symbols, 'key', cache_seconds=0, deadline=5)
+
+    assert httpclient._circuits['finnhub'][0] == httpclient.CIRCUIT_FAILURE_THRESHOLD
+    assert httpclient.CIRCUIT_COOLDOWN_SECONDS - 5 < cooldown('finnhub') <= httpclient.CIRCUIT_COOLDOWN_SECONDS
+
+def test_half_open_circuit_sends_one_probe_and_doubles_cooldown():
+    symbols = tuple(f"SYM{i}" for i in range(stocks.MAX_SYMBOLS))
+    httpclient._circuits['finnhub'] = [httpclient.CIRCUIT_FAILURE_THRESHOLD, time.monotonic() - 1, False]
+    session = FailingSession(1)
+    httpclient.set_session(session)
+
+    with pytest.raises(RuntimeError):
+        stocks.fetch_quotes(symbols, 'key', cache_seconds=0, deadline=5)
+
+    assert session.calls == 1
+    assert 2 * httpclient.CIRCUIT_COOLDOWN_SECONDS - 5 < cooldown('finnhub') <= 2 * httpclient.CIRCUIT_COOLDOWN_SECONDS
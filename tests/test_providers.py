@@ -0,0 +1,36 @@
+import time
+
+import pytest
+
+import providers
+
+class StubProvider(providers.Provider):
+    name = 'stub'
+
+    def params(self, config):
+        return config['units']
+
+    def fetch(self, config):
+        return {'units': config['units']}
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    monkeypatch.setattr(providers, 'LAST_GOOD_DIR', str(tmp_path))
+    return StubProvider()
+
+def test_snapshot_for_other_settings_is_not_returned(provider):
+    provider.publish({'temperature': 70}, 'F')
+
+    assert provider.wait_for_snapshot('F', timeout=0).data == {'temperature': 70}
+    assert provider.wait_for_snapshot('C', timeout=0.05) is None
+
+def test_gives_up_waiting_until_a_fetch_for_the_settings_succeeds(provider):
+    provider.publish({'temperature': 70}, 'F')
+    assert provider.wait_for_snapshot('C', timeout=0.05) is None
+
+    start = time.monotonic()
+    assert provider.wait_for_snapshot('C', timeout=5) is None
+    assert time.monotonic() - start < 1
+
+    provider.publish({'temperature': 21}, 'C')
+    assert provider.wait_for_snapshot('C', timeout=0).data == {'temperature': 21}
@@ -1,13 +1,17 @@
-from flask import Flask, render_template, request, redirect
+from flask import Flask, Response, render_template, request, redirect
 import yaml
 import os
+import copy
 from werkzeug.utils import secure_filename
 import glob
 
+import events
+from display import available_dashboards
+from lib import metrics
+
 app = Flask(__name__)
 
 CONFIG_PATH = 'config.yaml'
-FLAG_PATH = '.refresh_dashboard.flag'  # IPC flag
 
 # Folder to save user-uploaded images (working directory)
 UPLOAD_FOLDER = 'assets/User_Images'
@@ -19,12 +23,25 @@ def load_config():
     with open(CONFIG_PATH) as f:
         return yaml.safe_load(f)
 
-def save_config(cfg):
+def save_config(cfg, previous=None):
     with open(CONFIG_PATH, 'w') as f:
         yaml.dump(cfg, f)
-    # Touch the flag file
-    with open(FLAG_PATH, 'w') as flag:
-        flag.write('trigger')
+    notify_changes(previous, cfg)
+
+def notify_changes(previous, cfg):
+    """Tell the render loop what changed between two configs."""
+    if not isinstance(previous, dict) or not isinstance(cfg, dict):
+        events.notify(events.RELOAD_SECTION)
+        return
+    changed = [key for key in set(previous) | set(cfg) if previous.get(key) != cfg.get(key)]
+    if 'current_dashboard' in changed:
+        events.notify(events.SWITCH_DASHBOARD, cfg.get('current_dashboard'))
+        changed.remove('current_dashboard')
+    for section in changed:
+        events.notify(events.RELOAD_SECTION, section)
+    if not changed:
+        # Nothing to reload, but the user expects feedback on the panel
+        events.notify(events.FORCE_REFRESH)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -33,6 +50,7 @@ def allowed_file(filename):
 @app.route('/', methods=['GET', 'POST'])
 def index():
     config = load_config()
+    previous = copy.deepcopy(config)
 
     if request.method == 'POST':
         # --- Handle image deletion first ---
@@ -72,10 +90,10 @@ def index():
             cycle_config['interval_minutes'] = 5
 
         dashboards_config = cycle_config.setdefault('dashboards', {})
-        for dashboard in ['clock', 'youtube', 'weather', 'stocks', 'text', 'image']:
+        for dashboard, _ in available_dashboards():
             dashboards_config[dashboard] = f'enable_{dashboard}' in request.form
 
-        save_config(config)
+        save_config(config, previous)
         return redirect('/')
 
     # --- GET request ---
@@ -89,6 +107,7 @@ def index():
                            cycle_enabled=cycle_config.get('enabled', False),
                            cycle_interval=cycle_config.get('interval_minutes', 5),
                            dashboard_enables=cycle_config.get('dashboards', {}),
+                           dashboards=available_dashboards(),
                            images_list=images_list)
 
 
@@ -96,15 +115,26 @@ def index():
 @app.route('/edit', methods=['GET', 'POST'])
 def edit():
     if request.method == 'POST':
+        try:
+            previous = load_config()
+        except yaml.YAMLError:
+            previous = None  # the file is broken; this editor is how it gets fixed
         new_config = request.form['config']
         with open(CONFIG_PATH, 'w') as f:
             f.write(new_config)
-        # Touch the flag file
-        with open(FLAG_PATH, 'w') as flag:
-            flag.write('trigger')
+        try:
+            parsed = yaml.safe_load(new_config)
+        except yaml.YAMLError:
+            parsed = None
+        notify_changes(previous, parsed)
         return redirect('/')
     
     return render_template('edit.html', config=open(CONFIG_PATH).read())
 
+@app.route('/metrics')
+def prometheus_metrics():
+    # Only meaningful when the web UI runs inside main.py, next to the render loop
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080, debug=True)